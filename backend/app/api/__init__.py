@@ -1,5 +1,5 @@
 # API module initialization
-from app.api import auth, users, products, orders, production, work_logs, salaries, expenses
+from app.api import auth, users, products, orders, production, work_logs, salaries, expenses, search
 
 __all__ = [
     "auth",
@@ -9,5 +9,6 @@ __all__ = [
     "production",
     "work_logs",
     "salaries",
-    "expenses"
+    "expenses",
+    "search"
 ]
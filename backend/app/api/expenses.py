@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
 from app.core.database import get_db
+from app.core.export import ExportFormat, stream_export
 from app.core.dependencies import get_admin_user
 from app.models.user import User
-from app.models.expense import Expense
+from app.models.expense import Expense, ExpenseType
+from app.models.product import Product
 from app.models.cash_withdrawal import CashWithdrawal
 from app.schemas.expense import (
     ExpenseCreate,
@@ -12,6 +17,7 @@ from app.schemas.expense import (
     CashWithdrawalCreate,
     CashWithdrawalResponse
 )
+from app.services import rollups
 
 router = APIRouter()
 
@@ -30,6 +36,8 @@ async def create_expense(
     )
     
     db.add(expense)
+    db.flush()
+    rollups.record_expense(db, expense)
     db.commit()
     db.refresh(expense)
     
@@ -47,6 +55,36 @@ async def get_expenses(
         print(f"Error getting expenses: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/export")
+async def export_expenses(
+    expense_type: Optional[ExpenseType] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    fmt: ExportFormat = Query(ExportFormat.CSV, alias="format"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Потоковая выгрузка расходов (CSV / NDJSON)"""
+    statement = select(
+        Expense.id,
+        Expense.created_at,
+        Expense.expense_type,
+        Expense.name,
+        Expense.amount,
+        Expense.product_id,
+        Product.name.label("product_name"),
+        Expense.description
+    ).outerjoin(Product, Product.id == Expense.product_id)
+    
+    if expense_type:
+        statement = statement.where(Expense.expense_type == expense_type)
+    if start_date:
+        statement = statement.where(Expense.created_at >= start_date)
+    if end_date:
+        statement = statement.where(Expense.created_at <= end_date)
+    
+    return stream_export(db, statement.order_by(Expense.id), "expenses", fmt)
+
 @router.get("/{expense_id}", response_model=ExpenseResponse)
 async def get_expense(
     expense_id: int,
@@ -76,8 +114,10 @@ async def update_expense(
         )
     
     update_data = expense_in.dict(exclude_unset=True)
+    rollups.record_expense(db, expense, sign=-1)
     for field, value in update_data.items():
         setattr(expense, field, value)
+    rollups.record_expense(db, expense)
     
     db.commit()
     db.refresh(expense)
@@ -98,6 +138,7 @@ async def delete_expense(
             detail="Expense not found"
         )
     
+    rollups.record_expense(db, expense, sign=-1)
     db.delete(expense)
     db.commit()
     print(f"Expense {expense_id} deleted")
@@ -1,18 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
 from datetime import datetime
+from collections import defaultdict
 
 from app.core.dependencies import get_admin_or_manager_user
 from app.core.security import get_current_active_user
 from app.core.database import get_db
+from app.core.export import ExportFormat, stream_export
 from app.models.user import User, UserRole
-from app.models.order import Order, OrderStatus
+from app.models.order import Order, OrderStatus, OrderItem
 from app.models.product import Product
-from app.schemas.order import OrderCreate, OrderResponse, OrderStatusUpdate
+from app.models.rollup import OrderStageProgress
+from app.models.work_log import WorkLog
+from app.schemas.order import (
+    OrderCreate, OrderResponse, OrderStatusUpdate,
+    OrderStatusBatchItem, OrderStatusBatchResult
+)
+from app.services import rollups, balances, inventory, stock
+from app.services.order_filters import order_filters
 
 router = APIRouter()
 
+MAX_STATUS_BATCH_SIZE = 500
+
 
 @router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
@@ -31,9 +43,9 @@ async def create_order(
     # Обработка товаров (как старых product_id так и новых items)
     items_to_create = []
     if order_in.items:
-        items_to_create = order_in.items
+        items_to_create = [(item.product_id, item.quantity) for item in order_in.items]
     elif order_in.product_id and order_in.quantity:
-        items_to_create = [{"product_id": order_in.product_id, "quantity": order_in.quantity}]
+        items_to_create = [(order_in.product_id, order_in.quantity)]
     
     if not items_to_create:
         raise HTTPException(
@@ -41,6 +53,20 @@ async def create_order(
             detail="Заказ должен содержать хотя бы один товар"
         )
     
+    # Проверка товаров одним запросом
+    product_ids = {p_id for p_id, _ in items_to_create}
+    prices = {
+        p_id: (price, cost) for p_id, price, cost in db.query(
+            Product.id, Product.price, Product.cost
+        ).filter(Product.id.in_(list(product_ids))).all()
+    }
+    unknown_ids = product_ids - prices.keys()
+    if unknown_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Товары не найдены: {', '.join(str(p_id) for p_id in sorted(unknown_ids))}"
+        )
+    
     # Определение статуса заказа
     if current_user.role == UserRole.WHOLESALER:
         initial_status = OrderStatus.PENDING
@@ -52,8 +78,8 @@ async def create_order(
     # Создание заголовка заказа
     db_order = Order(
         # Сохраняем первый товар в заголовок для совместимости
-        product_id=items_to_create[0]["product_id"] if isinstance(items_to_create[0], dict) else items_to_create[0].product_id,
-        quantity=items_to_create[0]["quantity"] if isinstance(items_to_create[0], dict) else items_to_create[0].quantity,
+        product_id=items_to_create[0][0],
+        quantity=items_to_create[0][1],
         deadline=order_in.deadline,
         status=initial_status,
         created_by=current_user.id,
@@ -69,38 +95,22 @@ async def create_order(
     db.add(db_order)
     db.flush() # Получаем ID заказа
     
-    # Создание позиций заказа
-    from app.models.order import OrderItem
-    for item in items_to_create:
-        p_id = item["product_id"] if isinstance(item, dict) else item.product_id
-        qty = item["quantity"] if isinstance(item, dict) else item.quantity
-        
-        # Проверка товара
-        product = db.query(Product).filter(Product.id == p_id).first()
-        if not product:
-            continue
-            
-        db_item = OrderItem(
-            order_id=db_order.id,
-            product_id=p_id,
-            quantity=qty,
-            price_at_order=product.price
-        )
-        db.add(db_item)
-        
-        # Обновление инвентаря
-        if initial_status == OrderStatus.ACCEPTED:
-            from app.models.production_inventory import ProductionInventory
-            inventory = db.query(ProductionInventory).filter(
-                ProductionInventory.product_id == p_id,
-                ProductionInventory.stage_id == 0
-            ).first()
-            
-            if inventory:
-                inventory.quantity += qty
-            else:
-                inventory = ProductionInventory(product_id=p_id, stage_id=0, quantity=qty)
-                db.add(inventory)
+    # Создание позиций заказа одним INSERT; цена и себестоимость фиксируются,
+    # чтобы учет продажи и его отмена не зависели от последующих изменений товара
+    db.execute(insert(OrderItem), [
+        {
+            "order_id": db_order.id, "product_id": p_id, "quantity": qty,
+            "price_at_order": prices[p_id][0], "cost_at_order": prices[p_id][1]
+        }
+        for p_id, qty in items_to_create
+    ])
+    
+    # Обновление инвентаря: одна строка на товар
+    if initial_status == OrderStatus.ACCEPTED:
+        quantities = defaultdict(int)
+        for p_id, qty in items_to_create:
+            quantities[p_id] += qty
+        inventory.add_many(db, 0, quantities)
 
     db.commit()
     db.refresh(db_order)
@@ -111,30 +121,167 @@ async def create_order(
 @router.get("/", response_model=List[OrderResponse])
 async def get_orders(
     status: OrderStatus = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    deadline_from: Optional[datetime] = None,
+    deadline_to: Optional[datetime] = None,
+    customer: Optional[str] = None,
+    after_created_at: Optional[datetime] = None,
+    after_id: Optional[int] = None,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Получение списка заказов"""
-    query = db.query(Order)
+    """
+    Получение списка заказов (по возрастанию created_at, id).
+    Для следующей страницы передайте created_at и id последнего заказа
+    в after_created_at и after_id (keyset-пагинация вместо skip).
+    """
+    filters = order_filters(current_user, status, start_date, end_date, deadline_from, deadline_to, customer)
     
-    # Фильтрация по роли пользователя
-    if current_user.role == UserRole.WORKER:
-        # Сотрудники видят только заказы в работе
-        query = query.filter(Order.status == OrderStatus.IN_PROGRESS)
-    elif current_user.role == UserRole.WHOLESALER:
-        # Оптовики видят только свои заказы
-        query = query.filter(Order.wholesaler_id == current_user.id)
+    if (after_created_at is None) != (after_id is None):
+        raise HTTPException(
+            status_code=400,
+            detail="after_created_at и after_id передаются вместе"
+        )
+    if after_id is not None:
+        filters.append(tuple_(Order.created_at, Order.id) > tuple_(after_created_at, after_id))
     
-    # Фильтрация по статусу
-    if status:
-        query = query.filter(Order.status == status)
+    query = db.query(Order).options(
+        selectinload(Order.items)
+    ).filter(*filters).order_by(Order.created_at, Order.id)
     
     orders = query.offset(skip).limit(limit).all()
     return orders
 
 
+@router.get("/export")
+async def export_orders(
+    status: OrderStatus = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    deadline_from: Optional[datetime] = None,
+    deadline_to: Optional[datetime] = None,
+    customer: Optional[str] = None,
+    fmt: ExportFormat = Query(ExportFormat.CSV, alias="format"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Потоковая выгрузка заказов (CSV / NDJSON), по строке на каждую позицию заказа"""
+    product_id = func.coalesce(OrderItem.product_id, Order.product_id)
+    statement = select(
+        Order.id.label("order_id"),
+        Order.created_at,
+        Order.status,
+        Order.deadline,
+        Order.delivered_at,
+        Order.wholesaler_id,
+        Order.customer_name,
+        Order.customer_phone,
+        Order.customer_address,
+        Order.total_price,
+        Order.prepayment,
+        Order.payment_method,
+        product_id.label("product_id"),
+        Product.name.label("product_name"),
+        func.coalesce(OrderItem.quantity, Order.quantity).label("quantity"),
+        OrderItem.price_at_order
+    ).outerjoin(
+        OrderItem, OrderItem.order_id == Order.id
+    ).outerjoin(
+        Product, Product.id == product_id
+    ).where(
+        *order_filters(current_user, status, start_date, end_date, deadline_from, deadline_to, customer)
+    ).order_by(Order.id, OrderItem.id)
+    
+    return stream_export(db, statement, "orders", fmt)
+
+
+@router.post("/status/batch", response_model=List[OrderStatusBatchResult])
+async def update_order_status_batch(
+    updates: List[OrderStatusBatchItem],
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_or_manager_user)
+):
+    """
+    Пакетное обновление статусов заказов в одной транзакции.
+    Заказы с ошибками (не найден, не хватает товара) пропускаются, остальные применяются.
+    """
+    if len(updates) > MAX_STATUS_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Слишком много заказов (не более {MAX_STATUS_BATCH_SIZE})"
+        )
+    
+    # Заказы и остатки товаров - по одному запросу
+    order_ids = {update.order_id for update in updates}
+    orders = {
+        order.id: order
+        for order in db.query(Order).options(
+            selectinload(Order.items)
+        ).filter(Order.id.in_(list(order_ids))).all()
+    } if order_ids else {}
+    delivering = [
+        orders[update.order_id] for update in updates
+        if update.order_id in orders
+        and update.status == OrderStatus.DELIVERED
+        and orders[update.order_id].status != OrderStatus.DELIVERED
+    ]
+    product_ids = {pid for order in delivering for pid in _order_quantities(order)}
+    available = dict(
+        db.query(Product.id, Product.stock).filter(Product.id.in_(list(product_ids))).all()
+    ) if product_ids else {}
+    
+    results = []
+    seen = set()
+    stage0 = defaultdict(int)
+    to_remove = defaultdict(int)
+    for update in updates:
+        order = orders.get(update.order_id)
+        detail = None
+        if order is None:
+            detail = "Заказ не найден"
+        elif update.order_id in seen:
+            detail = "Заказ указан в запросе несколько раз"
+        elif update.status == OrderStatus.DELIVERED and order.status != OrderStatus.DELIVERED:
+            # Проверка остатков с учетом заказов, уже сданных в этом запросе
+            needs = _order_quantities(order)
+            short = [
+                pid for pid, qty in needs.items()
+                if available.get(pid, 0) - to_remove.get(pid, 0) < qty
+            ]
+            if short:
+                detail = "Недостаточно товара на складе: " + ", ".join(
+                    f"#{pid} (доступно {available.get(pid, 0) - to_remove.get(pid, 0)})" for pid in short
+                )
+            else:
+                for pid, qty in needs.items():
+                    to_remove[pid] += qty
+        seen.add(update.order_id)
+        
+        if detail is None:
+            _apply_status(db, order, update.status, stage0)
+        results.append(OrderStatusBatchResult(
+            order_id=update.order_id,
+            success=detail is None,
+            status=order.status if order else None,
+            detail=detail
+        ))
+    
+    # Списание со склада одним условным UPDATE на товар
+    if stock.remove_many(db, to_remove):
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Остатки на складе изменились во время обработки, повторите запрос"
+        )
+    inventory.add_many(db, 0, stage0)
+    
+    db.commit()
+    return results
+
+
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: int,
@@ -159,6 +306,39 @@ async def get_order(
     return order
 
 
+def _order_quantities(order: Order) -> dict:
+    """Количество товаров в заказе {product_id: quantity} (для старых заказов - из заголовка)"""
+    if not order.items:
+        return {order.product_id: order.quantity}
+    quantities = defaultdict(int)
+    for item in order.items:
+        quantities[item.product_id] += item.quantity
+    return quantities
+
+
+def _apply_status(db: Session, order: Order, new_status: OrderStatus, stage0: dict):
+    """
+    Меняет статус заказа и учитывает побочные эффекты (кроме списания со склада).
+    Пополнение временного склада накапливается в stage0 {product_id: quantity}.
+    """
+    old_status = order.status
+    order.status = new_status
+    
+    # Если заказ перешел в статус Принят (из Ожидания), добавляем на временный склад
+    if new_status == OrderStatus.ACCEPTED and old_status == OrderStatus.PENDING:
+        for product_id, quantity in _order_quantities(order).items():
+            stage0[product_id] += quantity
+
+    # Если заказ сдан - учитываем продажу
+    if new_status == OrderStatus.DELIVERED and old_status != OrderStatus.DELIVERED:
+        order.delivered_at = datetime.utcnow()
+        rollups.record_sale(db, order)
+
+    # Если доставленный заказ вернули в другой статус - убираем его из продаж
+    if old_status == OrderStatus.DELIVERED and new_status != OrderStatus.DELIVERED:
+        rollups.record_sale(db, order, sign=-1)
+
+
 @router.patch("/{order_id}/status", response_model=OrderResponse)
 async def update_order_status(
     order_id: int,
@@ -167,39 +347,29 @@ async def update_order_status(
     current_user: User = Depends(get_admin_or_manager_user)
 ):
     """Обновление статуса заказа (администратор или менеджер)"""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = db.query(Order).options(selectinload(Order.items)).filter(Order.id == order_id).first()
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Заказ не найден"
         )
     
-    old_status = order.status
-    order.status = status_update.status
-    
-    # Если заказ перешел в статус Принят (из Ожидания), добавляем на временный склад
-    if status_update.status == OrderStatus.ACCEPTED and old_status == OrderStatus.PENDING:
-        from app.models.production_inventory import ProductionInventory
-        inventory = db.query(ProductionInventory).filter(
-            ProductionInventory.product_id == order.product_id,
-            ProductionInventory.stage_id == 0
-        ).first()
-        if inventory:
-            inventory.quantity += order.quantity
-        else:
-            inventory = ProductionInventory(product_id=order.product_id, stage_id=0, quantity=order.quantity)
-            db.add(inventory)
-
-    # Если заказ сдан - списываем товар со склада
-    if status_update.status == OrderStatus.DELIVERED and old_status != OrderStatus.DELIVERED:
-        product = db.query(Product).filter(Product.id == order.product_id).first()
-        if product.stock < order.quantity:
+    # Если заказ сдан - списываем со склада все позиции заказа (условными UPDATE)
+    if status_update.status == OrderStatus.DELIVERED and order.status != OrderStatus.DELIVERED:
+        short = stock.remove_many(db, _order_quantities(order))
+        if short:
+            db.rollback()
+            available = db.query(Product.id, Product.stock).filter(Product.id.in_(short)).all()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Недостаточно товара на складе. Доступно: {product.stock}"
+                detail="Недостаточно товара на складе. Доступно: " + ", ".join(
+                    f"#{product_id}: {product_stock}" for product_id, product_stock in available
+                )
             )
-        product.stock -= order.quantity
-        order.delivered_at = datetime.utcnow()
+    
+    stage0 = defaultdict(int)
+    _apply_status(db, order, status_update.status, stage0)
+    inventory.add_many(db, 0, stage0)
     
     db.commit()
     db.refresh(order)
@@ -220,6 +390,18 @@ async def delete_order(
             detail="Заказ не найден"
         )
     
+    if order.status == OrderStatus.DELIVERED:
+        rollups.record_sale(db, order, sign=-1)
+    db.query(OrderStageProgress).filter(OrderStageProgress.order_id == order.id).delete()
+    
+    # Записи о работе удаляются вместе с заказом - отменяем их учет в сводках и балансах
+    work_logs = db.query(
+        WorkLog.worker_id, WorkLog.product_id, WorkLog.completed_at,
+        WorkLog.quantity, WorkLog.payment, WorkLog.is_paid
+    ).filter(WorkLog.order_id == order.id).all()
+    rollups.record_work_logs_deleted(db, work_logs)
+    balances.record_work_logs_deleted(db, work_logs)
+    
     db.delete(order)
     db.commit()
     return None
\ No newline at end of file
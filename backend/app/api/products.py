@@ -1,17 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional, Any
+from collections import defaultdict
 from app.core.database import get_db
 from app.core.security import get_current_active_user
 from app.core.dependencies import get_admin_or_manager_user, get_worker_user
+from app.core.etag import conditional_get
 from app.models.user import User, UserRole
 from app.models.product import Product
 from app.models.production_stage import ProductionStage
 from app.models.production_inventory import ProductionInventory
-from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate
+from app.models.work_log import WorkLog
+from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate, ProduceItem, ProduceItemResult
+from app.services import stage_graph, inventory
 
 router = APIRouter()
 
+# Tables the catalog responses are built from (ETag versions)
+CATALOG_TABLES = ("products", "production_stages")
+
+MAX_PRODUCE_BATCH_SIZE = 500
+
 # --- WIP / Production Endpoints (MUST be before /{product_id}) ---
 
 @router.get("/wip/pipeline")
@@ -23,17 +32,19 @@ async def get_wip_pipeline(
     Returns aggregated production pipeline data.
     Shows products and their quantity at each stage.
     """
-    # Get all inventory records
-    inventory_items = db.query(ProductionInventory).all()
-    
-    # We need to structure this data: Product -> Stages -> Quantity
-    # Let's get all products that have inventory > 0
-    product_ids = set([item.product_id for item in inventory_items if item.quantity > 0])
+    # Inventory with quantity > 0, pre-grouped by product
+    inventory_items = db.query(ProductionInventory).filter(ProductionInventory.quantity > 0).all()
+    inventory_by_product = defaultdict(list)
+    for item in inventory_items:
+        inventory_by_product[item.product_id].append(item)
     
-    if not product_ids:
+    if not inventory_by_product:
         return []
 
-    products = db.query(Product).filter(Product.id.in_(product_ids)).all()
+    # Products with their stages in one extra query (selectinload)
+    products = db.query(Product).options(
+        selectinload(Product.stages)
+    ).filter(Product.id.in_(list(inventory_by_product))).order_by(Product.id).all()
     
     result = []
     for product in products:
@@ -52,18 +63,11 @@ async def get_wip_pipeline(
             }
             
         # Fill quantities
-        product_inventory = [i for i in inventory_items if i.product_id == product.id]
         total_wip = 0
-        
-        for item in product_inventory:
-            if item.quantity > 0:
-                if item.stage_id == 0:
-                    stage_map[0]["quantity"] = item.quantity
-                else:
-                    # Find matching stage
-                    if item.stage_id in stage_map:
-                        stage_map[item.stage_id]["quantity"] = item.quantity
-                total_wip += item.quantity
+        for item in inventory_by_product[product.id]:
+            if item.stage_id in stage_map:
+                stage_map[item.stage_id]["quantity"] = item.quantity
+            total_wip += item.quantity
         
         # Convert stage_map to list, sorted
         # Initial stage (0) first, then actual stages
@@ -91,56 +95,27 @@ async def get_wip_tasks(
     A task is available if there is inventory at the previous stage (stage-1 or 0).
     """
     # Simply return all inventory > 0 where next stage exists
-    # But wait, inventory record shows WHERE items currently ARE.
     # If items are at stage 0 (Warehouse), they are ready for Stage 1.
     # If items are at Stage 1, they are ready for Stage 2 (if Stage 2 exists).
     
     inventory_items = db.query(ProductionInventory).filter(ProductionInventory.quantity > 0).all()
+    graphs = stage_graph.get_graphs(db, {item.product_id for item in inventory_items})
     
     tasks = []
     
     for item in inventory_items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if not product:
-            continue
-            
-        # Get stages sorted
-        stages = sorted(product.stages, key=lambda x: x.order_num)
-        
-        if not stages:
+        graph = graphs.get(item.product_id)
+        if not graph:
             continue
-            
-        # Determine NEXT stage
-        next_stage = None
-        current_stage_name = "Склад заготовок"
         
-        if item.stage_id == 0:
-            # Current is Warehouse, Next is first stage
-            if stages:
-                next_stage = stages[0]
-        else:
-            # Current is some stage. Find it in list and get next.
-            try:
-                # Find index of current stage
-                current_stage_obj = next((s for s in stages if s.id == item.stage_id), None)
-                if current_stage_obj:
-                    current_stage_name = current_stage_obj.name
-                    idx = stages.index(current_stage_obj)
-                    if idx + 1 < len(stages):
-                        next_stage = stages[idx + 1]
-                    else:
-                        # No next stage -> Ready for Final Warehouse (Finished Goods)
-                        # Usually "Finished" is implicit.
-                        pass 
-            except ValueError:
-                continue
-                
+        # Last stage has no next one -> items are ready for Finished Goods
+        next_stage = graph.next_stage(item.stage_id)
         if next_stage:
             tasks.append({
-                "product_id": product.id,
-                "product_name": product.name,
+                "product_id": graph.product_id,
+                "product_name": graph.product_name,
                 "current_stage_id": item.stage_id,
-                "current_stage_name": current_stage_name,
+                "current_stage_name": graph.stage_name(item.stage_id),
                 "next_stage_id": next_stage.id,
                 "next_stage_name": next_stage.name,
                 "payment": next_stage.payment,
@@ -158,37 +133,84 @@ async def get_wip_inventory(
     Simple list of all inventory items > 0
     """
     items = db.query(ProductionInventory).filter(ProductionInventory.quantity > 0).all()
+    graphs = stage_graph.get_graphs(db, {item.product_id for item in items})
     result = []
     for item in items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
+        graph = graphs.get(item.product_id)
         
-        stage_name = "Склад заготовок"
-        if item.stage_id > 0 and product:
-            # Find stage name from product stages
-            stage = next((s for s in product.stages if s.id == item.stage_id), None)
-            if stage:
-                stage_name = stage.name
-            else:
-                stage_name = f"Stage {item.stage_id}"
+        stage_name = stage_graph.WAREHOUSE_STAGE_NAME
+        if item.stage_id > 0 and graph:
+            stage_name = graph.stage_name(item.stage_id) or f"Stage {item.stage_id}"
         
         result.append({
             "id": item.id,
             "product_id": item.product_id,
-            "product_name": product.name if product else "Unknown",
+            "product_name": graph.product_name if graph else "Unknown",
             "stage_id": item.stage_id,
             "stage_name": stage_name,
             "quantity": item.quantity
         })
     return result
 
+@router.post("/produce/batch", response_model=List[ProduceItemResult])
+async def produce_batch(
+    items: List[ProduceItem],
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_or_manager_user)
+):
+    """
+    Launches production for several products in one transaction.
+    Invalid items are reported in the per-item results and skipped; the rest are applied.
+    """
+    if len(items) > MAX_PRODUCE_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many items (max {MAX_PRODUCE_BATCH_SIZE})"
+        )
+    
+    # Validate all product ids with one IN query
+    requested_ids = {item.product_id for item in items}
+    existing_ids = {
+        row[0] for row in db.query(Product.id).filter(Product.id.in_(list(requested_ids))).all()
+    } if requested_ids else set()
+    
+    results = []
+    quantities = defaultdict(int)
+    for item in items:
+        detail = None
+        if item.product_id not in existing_ids:
+            detail = "Product not found"
+        elif item.quantity <= 0:
+            detail = "Quantity must be positive"
+        else:
+            quantities[item.product_id] += item.quantity
+        results.append(ProduceItemResult(
+            product_id=item.product_id,
+            quantity=item.quantity,
+            success=detail is None,
+            detail=detail
+        ))
+    
+    # All stage-0 increments as one batched upsert
+    inventory.add_many(db, 0, quantities)
+    db.commit()
+    return results
+
 # --- Standard Product Endpoints ---
 
 @router.get("/", response_model=List[ProductResponse])
 async def get_products(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    products = db.query(Product).all()
+    # Unchanged catalog -> 304 without touching the DB
+    not_modified = conditional_get(request, response, CATALOG_TABLES)
+    if not_modified:
+        return not_modified
+    
+    products = db.query(Product).options(selectinload(Product.stages)).all()
     # Pydantic will handle the serialization including nested stages
     return products
 
@@ -230,14 +252,21 @@ async def create_product(
         db.commit()
         db.refresh(product)
     
+    stage_graph.invalidate(product.id)
     return product
 
 @router.get("/{product_id}", response_model=ProductResponse)
 async def get_product(
     product_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
+    not_modified = conditional_get(request, response, CATALOG_TABLES, product_id)
+    if not_modified:
+        return not_modified
+    
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(
@@ -267,18 +296,58 @@ async def update_product(
         setattr(product, field, value)
     
     if stages_data is not None:
-        # Delete old stages and create new ones
-        db.query(ProductionStage).filter(ProductionStage.product_id == product.id).delete()
-        for stage_in in stages_data:
-            stage = ProductionStage(
-                product_id=product.id,
+        # Match stages by order_num so ids referenced by inventory / work logs stay stable
+        incoming = {stage_in["order_num"]: stage_in for stage_in in stages_data}
+        if len(incoming) != len(stages_data):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Duplicate stage order_num"
+            )
+        
+        removed = [stage for stage in product.stages if stage.order_num not in incoming]
+        if removed:
+            # Work logs keep a NOT NULL reference to their stage and WIP would be
+            # stranded, so only unused stages can be removed
+            removed_ids = [stage.id for stage in removed]
+            has_work_logs = db.query(
+                db.query(WorkLog.id).filter(WorkLog.stage_id.in_(removed_ids)).exists()
+            ).scalar()
+            has_inventory = db.query(
+                db.query(ProductionInventory.id).filter(
+                    ProductionInventory.product_id == product.id,
+                    ProductionInventory.stage_id.in_(removed_ids),
+                    ProductionInventory.quantity > 0
+                ).exists()
+            ).scalar()
+            if has_work_logs or has_inventory:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cannot remove a stage that has work logs or items in progress"
+                )
+            # Empty inventory rows of removed stages would be left orphaned
+            db.query(ProductionInventory).filter(
+                ProductionInventory.product_id == product.id,
+                ProductionInventory.stage_id.in_(removed_ids)
+            ).delete(synchronize_session=False)
+            for stage in removed:
+                # Removed stage (delete-orphan cascade deletes the row)
+                product.stages.remove(stage)
+        
+        for stage in product.stages:
+            stage_in = incoming.pop(stage.order_num)
+            for field in ("name", "payment"):
+                if getattr(stage, field) != stage_in[field]:
+                    setattr(stage, field, stage_in[field])
+        
+        for stage_in in incoming.values():
+            product.stages.append(ProductionStage(
                 name=stage_in["name"],
                 order_num=stage_in["order_num"],
                 payment=stage_in["payment"]
-            )
-            db.add(stage)
+            ))
     
     db.commit()
+    stage_graph.invalidate(product.id)
     db.refresh(product)
     return product
 
@@ -297,6 +366,7 @@ async def delete_product(
     
     db.delete(product)
     db.commit()
+    stage_graph.invalidate(product_id)
 
 @router.post("/{product_id}/produce")
 async def produce_product(
@@ -315,20 +385,7 @@ async def produce_product(
     # Add to inventory at stage 0 (or first stage)
     # Assuming stage_id=0 represents "Not Started" / "Raw Materials" or just "In Queue"
     
-    inventory = db.query(ProductionInventory).filter(
-        ProductionInventory.product_id == product_id,
-        ProductionInventory.stage_id == 0
-    ).first()
-    
-    if inventory:
-        inventory.quantity += quantity
-    else:
-        inventory = ProductionInventory(
-            product_id=product_id,
-            stage_id=0,
-            quantity=quantity
-        )
-        db.add(inventory)
+    inventory.add(db, product_id, 0, quantity)
     
     db.commit()
     return {"message": "Production launched", "quantity": quantity}
@@ -1,95 +1,111 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from sqlalchemy import func, case, literal, select, union_all
+from datetime import date, datetime, time, timedelta
 from typing import Optional
 
 from app.core.dependencies import get_admin_user
 from app.core.database import get_db
+from app.core.cache import report_cache
+from app.core.export import ExportFormat, stream_export
 from app.models.user import User
 from app.models.order import Order, OrderStatus
 from app.models.product import Product
 from app.models.expense import Expense, ExpenseType
-from app.models.work_log import WorkLog
 from app.models.cash_withdrawal import CashWithdrawal
 from app.models.salary_payment import SalaryPayment, PaymentType
+from app.models.rollup import DailySales, DailyExpense, DailyWorkerOutput, DailySalaryPayment
 from app.schemas.expense import CashWithdrawalCreate, CashWithdrawalResponse
+from app.schemas.report_job import ReportKind, ReportJobStatus, ReportJobCreate, ReportJobResponse
+from app.services import report_jobs
+from app.services.sales import sales_lines
 
 router = APIRouter()
 
+# Таблицы, от которых зависят закэшированные отчеты
+CASH_REPORT_TABLES = (
+    DailySales.__tablename__, DailyExpense.__tablename__, DailyWorkerOutput.__tablename__,
+    DailySalaryPayment.__tablename__, CashWithdrawal.__tablename__
+)
+SALES_REPORT_TABLES = (
+    DailySales.__tablename__, Order.__tablename__,
+    Product.__tablename__, User.__tablename__
+)
+WORKERS_REPORT_TABLES = (
+    DailyWorkerOutput.__tablename__, DailySalaryPayment.__tablename__,
+    User.__tablename__, Product.__tablename__
+)
+DASHBOARD_TABLES = (
+    DailySales.__tablename__, DailyWorkerOutput.__tablename__,
+    User.__tablename__, Product.__tablename__
+)
 
-@router.get("/cash")
-async def get_cash_report(
-    start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_admin_user)
-):
-    """Финансовый отчет по кассе (только администратор)"""
-    query_orders = db.query(Order).filter(Order.status == OrderStatus.DELIVERED)
-    query_expenses = db.query(Expense)
-    query_work_logs = db.query(WorkLog)
-    query_withdrawals = db.query(CashWithdrawal)
-    
-    # Фильтрация по датам
+
+def _period(column, start_date: Optional[date], end_date: Optional[date]):
+    """Условия фильтрации колонки по периоду"""
+    conditions = []
     if start_date:
-        query_orders = query_orders.filter(Order.delivered_at >= start_date)
-        query_expenses = query_expenses.filter(Expense.created_at >= start_date)
-        query_work_logs = query_work_logs.filter(WorkLog.completed_at >= start_date)
-        query_withdrawals = query_withdrawals.filter(CashWithdrawal.withdrawn_at >= start_date)
-    
+        conditions.append(column >= start_date)
     if end_date:
-        query_orders = query_orders.filter(Order.delivered_at <= end_date)
-        query_expenses = query_expenses.filter(Expense.created_at <= end_date)
-        query_work_logs = query_work_logs.filter(WorkLog.completed_at <= end_date)
-        query_withdrawals = query_withdrawals.filter(CashWithdrawal.withdrawn_at <= end_date)
-    
-    # Получение данных
-    delivered_orders = query_orders.all()
-    all_expenses = query_expenses.all()
-    all_work_logs = query_work_logs.all()
-    all_withdrawals = query_withdrawals.all()
-    
-    # Расчет продаж
-    sales = 0
-    for order in delivered_orders:
-        if order.total_price:
-            sales += order.total_price
-        else:
-            product = db.query(Product).filter(Product.id == order.product_id).first()
-            if product:
-                sales += order.quantity * product.price
-    
-    # Расчет себестоимости
-    cost_of_goods = 0
-    for order in delivered_orders:
-        product = db.query(Product).filter(Product.id == order.product_id).first()
-        if product:
-            cost_of_goods += order.quantity * product.cost
-    
-    # Расчет расходов
-    cost_expenses = sum(e.amount for e in all_expenses if e.expense_type == ExpenseType.COST)
-    other_expenses = sum(e.amount for e in all_expenses if e.expense_type == ExpenseType.OTHER)
+        conditions.append(column <= end_date)
+    return conditions
+
+
+def _day_range(start_date: Optional[datetime], end_date: Optional[datetime]):
+    """Границы периода, округленные до дней (сводные таблицы хранят данные по дням)"""
+    return (
+        start_date.date() if start_date else None,
+        end_date.date() if end_date else None
+    )
+
+
+def _datetime_period(column, start_day: Optional[date], end_day: Optional[date]):
+    """Условия фильтрации колонки с датой-временем по целым дням"""
+    return _period(
+        column,
+        datetime.combine(start_day, time.min) if start_day else None,
+        datetime.combine(end_day, time.max) if end_day else None
+    )
+
+
+def _cash_report(db: Session, start_day: Optional[date], end_day: Optional[date]) -> dict:
+    """Агрегаты кассового отчета по сводным таблицам"""
+    # Продажи и себестоимость
+    sales, cost_of_goods = db.query(
+        func.coalesce(func.sum(DailySales.revenue), 0),
+        func.coalesce(func.sum(DailySales.cost), 0)
+    ).filter(*_period(DailySales.day, start_day, end_day)).one()
+
+    # Расходы по типам
+    cost_expenses, other_expenses = db.query(
+        func.coalesce(func.sum(case((DailyExpense.expense_type == ExpenseType.COST, DailyExpense.amount), else_=0)), 0),
+        func.coalesce(func.sum(case((DailyExpense.expense_type == ExpenseType.OTHER, DailyExpense.amount), else_=0)), 0)
+    ).filter(*_period(DailyExpense.day, start_day, end_day)).one()
     total_expenses = cost_expenses + other_expenses
-    
-    # Расчет зарплат (начисления)
-    total_salaries = sum(log.payment for log in all_work_logs)
-    paid_salaries = sum(log.payment for log in all_work_logs if log.is_paid)
-    unpaid_salaries = sum(log.payment for log in all_work_logs if not log.is_paid)
+
+    # Зарплаты (начисления)
+    total_salaries, paid_salaries = db.query(
+        func.coalesce(func.sum(DailyWorkerOutput.earned), 0),
+        func.coalesce(func.sum(DailyWorkerOutput.paid), 0)
+    ).filter(*_period(DailyWorkerOutput.day, start_day, end_day)).one()
+    unpaid_salaries = total_salaries - paid_salaries
 
     # Зарплаты и Авансы (Оплаты)
     # Считаем реальный отток денег
-    salary_payments_sum = db.query(func.sum(SalaryPayment.amount)).scalar() or 0
-    
+    salary_payments_sum = db.query(func.sum(DailySalaryPayment.amount)).scalar() or 0
+
     # Изъятия
-    total_withdrawals = sum(w.amount for w in all_withdrawals)
-    
+    total_withdrawals = db.query(func.coalesce(func.sum(CashWithdrawal.amount), 0)).filter(
+        *_datetime_period(CashWithdrawal.created_at, start_day, end_day)
+    ).scalar()
+
     # Итоговые расчеты
     gross_profit = sales - cost_of_goods - cost_expenses
     net_profit = gross_profit - other_expenses - total_salaries
     # Баланс в кассе: продажи - расходы - реальные выплаты - изъятия
     cash_balance = sales - total_expenses - salary_payments_sum - total_withdrawals
-    
+
     return {
         "sales": sales,
         "cost_of_goods": cost_of_goods,
@@ -106,6 +122,73 @@ async def get_cash_report(
     }
 
 
+@router.get("/cash")
+async def get_cash_report(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Финансовый отчет по кассе (только администратор)"""
+    start_day, end_day = _day_range(start_date, end_date)
+    return report_cache.get_or_compute(
+        ("cash", start_day, end_day),
+        CASH_REPORT_TABLES,
+        lambda: _cash_report(db, start_day, end_day)
+    )
+
+
+@router.get("/cash/export")
+async def export_cash_ledger(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    fmt: ExportFormat = Query(ExportFormat.CSV, alias="format"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Потоковая выгрузка движения денег по кассе за период (только администратор)"""
+    lines = sales_lines(
+        Order.status == OrderStatus.DELIVERED,
+        *_period(Order.delivered_at, start_date, end_date)
+    ).subquery()
+    sales = select(
+        Order.delivered_at.label("date"),
+        literal("sale").label("kind"),
+        Order.id.label("reference_id"),
+        Order.customer_name.label("description"),
+        func.sum(lines.c.revenue).label("amount")
+    ).join(
+        lines, lines.c.order_id == Order.id
+    ).group_by(Order.id, Order.delivered_at, Order.customer_name)
+    expenses = select(
+        Expense.created_at,
+        case((Expense.expense_type == ExpenseType.COST, literal("cost_expense")), else_=literal("other_expense")),
+        Expense.id,
+        Expense.name,
+        -Expense.amount
+    ).where(*_period(Expense.created_at, start_date, end_date))
+    salary_payments = select(
+        SalaryPayment.created_at,
+        case((SalaryPayment.payment_type == PaymentType.ADVANCE, literal("advance")), else_=literal("salary")),
+        SalaryPayment.id,
+        User.full_name,
+        -SalaryPayment.amount
+    ).outerjoin(
+        User, User.id == SalaryPayment.worker_id
+    ).where(*_period(SalaryPayment.created_at, start_date, end_date))
+    withdrawals = select(
+        CashWithdrawal.created_at,
+        literal("withdrawal"),
+        CashWithdrawal.id,
+        CashWithdrawal.purpose,
+        -CashWithdrawal.amount
+    ).where(*_period(CashWithdrawal.created_at, start_date, end_date))
+
+    ledger = union_all(sales, expenses, salary_payments, withdrawals).subquery()
+    statement = select(ledger).order_by(ledger.c.date, ledger.c.kind, ledger.c.reference_id)
+    return stream_export(db, statement, "cash_ledger", fmt)
+
+
 @router.post("/cash/withdraw", response_model=CashWithdrawalResponse)
 async def withdraw_cash(
     withdrawal_in: CashWithdrawalCreate,
@@ -126,6 +209,79 @@ async def withdraw_cash(
     return db_withdrawal
 
 
+def _sales_report(db: Session, start_day: Optional[date], end_day: Optional[date]) -> dict:
+    """Продажи по товарам, оптовикам и дням из сводной таблицы (по позициям заказов)"""
+    days = _period(DailySales.day, start_day, end_day)
+    total_orders = db.query(func.count(Order.id)).filter(
+        Order.status == OrderStatus.DELIVERED,
+        *_datetime_period(Order.delivered_at, start_day, end_day)
+    ).scalar()
+
+    # Группировка по товарам
+    by_product = db.query(
+        DailySales.product_id,
+        Product.name,
+        func.sum(DailySales.quantity),
+        func.sum(DailySales.revenue)
+    ).outerjoin(
+        Product, Product.id == DailySales.product_id
+    ).filter(*days).group_by(DailySales.product_id, Product.name).having(
+        func.sum(DailySales.orders_count) > 0
+    ).order_by(DailySales.product_id).all()
+
+    # Группировка по оптовикам (wholesaler_id = 0 - заказы без оптовика)
+    by_wholesaler = db.query(
+        DailySales.wholesaler_id,
+        User.full_name,
+        func.sum(DailySales.quantity),
+        func.sum(DailySales.revenue)
+    ).outerjoin(
+        User, User.id == DailySales.wholesaler_id
+    ).filter(*days).group_by(DailySales.wholesaler_id, User.full_name).having(
+        func.sum(DailySales.orders_count) > 0
+    ).order_by(DailySales.wholesaler_id).all()
+
+    # Группировка по дням
+    by_day = db.query(
+        DailySales.day,
+        func.sum(DailySales.quantity),
+        func.sum(DailySales.revenue)
+    ).filter(*days).group_by(DailySales.day).having(
+        func.sum(DailySales.orders_count) > 0
+    ).order_by(DailySales.day).all()
+
+    return {
+        "total_orders": total_orders,
+        "total_revenue": sum(row[3] for row in by_product),
+        "sales_by_product": [
+            {
+                "product_id": product_id or None,
+                "product_name": name or "N/A",
+                "quantity_sold": quantity,
+                "revenue": revenue
+            }
+            for product_id, name, quantity, revenue in by_product
+        ],
+        "sales_by_wholesaler": [
+            {
+                "wholesaler_id": wholesaler_id or None,
+                "wholesaler_name": name,
+                "quantity_sold": quantity,
+                "revenue": revenue
+            }
+            for wholesaler_id, name, quantity, revenue in by_wholesaler
+        ],
+        "sales_by_day": [
+            {
+                "date": day.isoformat(),
+                "quantity_sold": quantity,
+                "revenue": revenue
+            }
+            for day, quantity, revenue in by_day
+        ]
+    }
+
+
 @router.get("/sales")
 async def get_sales_report(
     start_date: Optional[datetime] = None,
@@ -134,41 +290,91 @@ async def get_sales_report(
     current_user: User = Depends(get_admin_user)
 ):
     """Отчет по продажам (только администратор)"""
-    query = db.query(Order).filter(Order.status == OrderStatus.DELIVERED)
-    
-    if start_date:
-        query = query.filter(Order.delivered_at >= start_date)
-    if end_date:
-        query = query.filter(Order.delivered_at <= end_date)
-    
-    orders = query.all()
-    
-    # Группировка по товарам
-    sales_by_product = {}
-    total_revenue = 0
-    
-    for order in orders:
-        product = db.query(Product).filter(Product.id == order.product_id).first()
-        if product:
-            revenue = order.total_price if order.total_price else (order.quantity * product.price)
-            total_revenue += revenue
-            
-            if product.id not in sales_by_product:
-                sales_by_product[product.id] = {
-                    "product_id": product.id,
-                    "product_name": product.name,
-                    "quantity_sold": 0,
-                    "revenue": 0
-                }
-            
-            sales_by_product[product.id]["quantity_sold"] += order.quantity
-            sales_by_product[product.id]["revenue"] += revenue
-    
-    return {
-        "total_orders": len(orders),
-        "total_revenue": total_revenue,
-        "sales_by_product": list(sales_by_product.values())
-    }
+    start_day, end_day = _day_range(start_date, end_date)
+    return report_cache.get_or_compute(
+        ("sales", start_day, end_day),
+        SALES_REPORT_TABLES,
+        lambda: _sales_report(db, start_day, end_day)
+    )
+
+
+def _workers_report(db: Session, start_day: Optional[date], end_day: Optional[date]) -> dict:
+    """Статистика сотрудников по сводным таблицам"""
+    days = _period(DailyWorkerOutput.day, start_day, end_day)
+
+    output = db.query(
+        DailyWorkerOutput.worker_id.label("worker_id"),
+        func.sum(DailyWorkerOutput.logs_count).label("stages_completed"),
+        func.sum(DailyWorkerOutput.earned).label("earned"),
+        func.sum(DailyWorkerOutput.paid).label("paid"),
+        func.count(func.distinct(DailyWorkerOutput.day)).label("days_active")
+    ).filter(*days).group_by(DailyWorkerOutput.worker_id).subquery()
+
+    # Выплаты и авансы за всё время, предварительно сгруппированные по сотруднику
+    payments = db.query(
+        DailySalaryPayment.worker_id.label("worker_id"),
+        func.sum(case((DailySalaryPayment.payment_type == PaymentType.ADVANCE, DailySalaryPayment.amount), else_=0)).label("advances"),
+        func.sum(DailySalaryPayment.amount).label("total")
+    ).group_by(DailySalaryPayment.worker_id).subquery()
+
+    # Самый частый товар сотрудника за период (при равенстве - начатый раньше, затем по id)
+    product_counts = db.query(
+        DailyWorkerOutput.worker_id.label("worker_id"),
+        DailyWorkerOutput.product_id.label("product_id"),
+        func.row_number().over(
+            partition_by=DailyWorkerOutput.worker_id,
+            order_by=(
+                func.sum(DailyWorkerOutput.logs_count).desc(),
+                func.min(DailyWorkerOutput.day),
+                DailyWorkerOutput.product_id
+            )
+        ).label("rank")
+    ).filter(*days).group_by(DailyWorkerOutput.worker_id, DailyWorkerOutput.product_id).subquery()
+    top_products = db.query(
+        product_counts.c.worker_id,
+        func.coalesce(Product.name, "N/A").label("name")
+    ).outerjoin(
+        Product, Product.id == product_counts.c.product_id
+    ).filter(product_counts.c.rank == 1).subquery()
+
+    rows = db.query(
+        User.id,
+        User.full_name,
+        User.phone,
+        output.c.stages_completed,
+        output.c.earned,
+        output.c.paid,
+        output.c.days_active,
+        func.coalesce(payments.c.advances, 0),
+        func.coalesce(payments.c.total, 0),
+        top_products.c.name
+    ).join(
+        output, output.c.worker_id == User.id
+    ).outerjoin(
+        payments, payments.c.worker_id == User.id
+    ).outerjoin(
+        top_products, top_products.c.worker_id == User.id
+    ).order_by(User.id).all()
+
+    workers = []
+    for (worker_id, name, phone, stages_completed, total_earned, total_paid,
+         days_active, total_advances, total_all_money, top_product) in rows:
+        workers.append({
+            "worker_id": worker_id,
+            "worker_name": name,
+            "worker_phone": phone,
+            "stages_completed": stages_completed,
+            "total_earned": total_earned,
+            "total_paid": total_paid,
+            "total_unpaid": total_earned - total_paid,
+            "total_advances": total_advances,
+            # Real balance = Everything Earned - Everything Paid
+            "current_balance": total_earned - total_all_money,
+            "top_product": top_product or "—",
+            "avg_daily": total_earned / days_active if days_active else 0
+        })
+
+    return {"workers": workers}
 
 
 @router.get("/workers")
@@ -179,139 +385,164 @@ async def get_workers_report(
     current_user: User = Depends(get_admin_user)
 ):
     """Отчет по эффективности сотрудников (только администратор)"""
-    query = db.query(WorkLog)
-    
-    if start_date:
-        query = query.filter(WorkLog.completed_at >= start_date)
-    if end_date:
-        query = query.filter(WorkLog.completed_at <= end_date)
-    
-    work_logs = query.all()
-    
-    # Группировка по сотрудникам
-    workers_stats = {}
-    
-    # 1. Считаем начисления по логам
-    for log in work_logs:
-        worker = db.query(User).filter(User.id == log.worker_id).first()
-        if worker:
-            if worker.id not in workers_stats:
-                workers_stats[worker.id] = {
-                    "worker_id": worker.id,
-                    "worker_name": worker.full_name,
-                    "worker_phone": worker.phone,
-                    "stages_completed": 0,
-                    "total_earned": 0,
-                    "total_paid": 0,
-                    "total_unpaid": 0,
-                    "total_advances": 0,
-                    "current_balance": 0,
-                    "top_product": "—",
-                    "avg_daily": 0,
-                    "days_active": set(), # Use a set to track unique dates
-                    "product_counts": {} # Temporary helper
-                }
-            
-            # Начисления
-            stats = workers_stats[log.worker_id]
-            stats["stages_completed"] += 1
-            stats["total_earned"] += log.payment
-            if log.is_paid:
-                stats["total_paid"] += log.payment
-            else:
-                stats["total_unpaid"] += log.payment
-            
-            # Top product tracking
-            # Ensure log.product is loaded or joined
-            if log.product_id:
-                product = db.query(Product).filter(Product.id == log.product_id).first()
-                p_name = product.name if product else "N/A"
-            else:
-                p_name = "N/A"
-            stats["product_counts"][p_name] = stats["product_counts"].get(p_name, 0) + 1
-            
-            # Keep track of active days
-            stats["days_active"].add(log.completed_at.date())
-
-    # 2. Считаем выплаты и финализируем статистику
-    for worker_id, stats in workers_stats.items():
-        # Source of truth for all money given to worker
-        all_payments = db.query(SalaryPayment).filter(SalaryPayment.worker_id == worker_id).all()
-        
-        total_advances = sum(p.amount for p in all_payments if p.payment_type == PaymentType.ADVANCE)
-        total_salary_payouts = sum(p.amount for p in all_payments if p.payment_type == PaymentType.SALARY)
-        total_all_money = sum(p.amount for p in all_payments)
-        
-        stats["total_advances"] = total_advances
-        # Real balance = Everything Earned - Everything Paid
-        stats["current_balance"] = stats["total_earned"] - total_all_money
-        
-        # Performance Finalization
-        if stats["product_counts"]:
-            stats["top_product"] = max(stats["product_counts"], key=stats["product_counts"].get)
-        
-        days_count = len(stats["days_active"])
-        if days_count > 0:
-            stats["avg_daily"] = stats["total_earned"] / days_count
-        
-        # Clean up temporary fields
-        del stats["days_active"]
-        del stats["product_counts"]
-
-    return {"workers": list(workers_stats.values())}
+    start_day, end_day = _day_range(start_date, end_date)
+    return report_cache.get_or_compute(
+        ("workers", start_day, end_day),
+        WORKERS_REPORT_TABLES,
+        lambda: _workers_report(db, start_day, end_day)
+    )
 
 
-@router.get("/dashboard-stats")
-async def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_admin_user)
-):
-    """Статистика для графиков (за последние 30 дней)"""
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=30)
-    
-    # 1. Продажи по дням
+def _dashboard_stats(db: Session, start_day: date, end_day: date) -> dict:
+    """Данные для графиков дашборда за период [start_day, end_day]"""
+    # 1. Продажи по дням из сводной таблицы
+    sales_rows = db.query(
+        DailySales.day,
+        func.sum(DailySales.revenue)
+    ).filter(
+        DailySales.day >= start_day,
+        DailySales.day <= end_day
+    ).group_by(DailySales.day).all()
+    sales_by_day = {day: amount or 0 for day, amount in sales_rows}
+
+    # Пустые дни заполняем нулями
     daily_sales = []
-    curr = start_date
-    while curr <= end_date:
-        day_start = curr.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = curr.replace(hour=23, minute=59, second=59, microsecond=999999)
-        
-        # Сумма выполненных заказов за этот день
-        day_orders = db.query(Order).filter(
-            Order.status == OrderStatus.DELIVERED,
-            Order.delivered_at >= day_start,
-            Order.delivered_at <= day_end
-        ).all()
-        
-        sum_day = 0
-        for o in day_orders:
-            sum_day += o.total_price if o.total_price else (o.quantity * o.product.price)
-            
+    curr = start_day
+    while curr <= end_day:
         daily_sales.append({
             "date": curr.strftime("%d.%m"),
-            "amount": sum_day
+            "amount": sales_by_day.get(curr, 0)
         })
         curr += timedelta(days=1)
-        
+
     # 2. Самые продаваемые товары
     top_products = db.query(
         Product.name,
-        func.sum(Order.quantity).label("total_qty")
-    ).join(Order).filter(
-        Order.status == OrderStatus.DELIVERED
-    ).group_by(Product.name).order_by(func.sum(Order.quantity).desc()).limit(5).all()
-    
-    # 3. Эффективность сотрудников (за последние 30 дней)
+        func.sum(DailySales.quantity).label("total_qty")
+    ).join(
+        DailySales, DailySales.product_id == Product.id
+    ).group_by(Product.name).having(
+        func.sum(DailySales.orders_count) > 0
+    ).order_by(func.sum(DailySales.quantity).desc()).limit(5).all()
+
+    # 3. Эффективность сотрудников за период
     worker_performance = db.query(
         User.full_name,
-        func.count(WorkLog.id).label("logs_count")
-    ).join(WorkLog).filter(
-        WorkLog.completed_at >= start_date
-    ).group_by(User.full_name).order_by(func.count(WorkLog.id).desc()).limit(5).all()
+        func.sum(DailyWorkerOutput.logs_count).label("logs_count")
+    ).join(
+        DailyWorkerOutput, DailyWorkerOutput.worker_id == User.id
+    ).filter(
+        DailyWorkerOutput.day >= start_day,
+        DailyWorkerOutput.day <= end_day
+    ).group_by(User.full_name).order_by(func.sum(DailyWorkerOutput.logs_count).desc()).limit(5).all()
 
     return {
         "daily_sales": daily_sales,
         "top_products": [{"name": p[0], "value": p[1]} for p in top_products],
         "worker_performance": [{"name": w[0], "value": w[1]} for w in worker_performance]
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/dashboard-stats")
+async def get_dashboard_stats(
+    days: int = Query(30, ge=1, le=3660),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Статистика для графиков (по умолчанию за последние 30 дней)"""
+    end_day = end_date or datetime.utcnow().date()
+    start_day = start_date or end_day - timedelta(days=days)
+    if start_day > end_day:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date не может быть позже end_date"
+        )
+
+    return report_cache.get_or_compute(
+        ("dashboard-stats", start_day, end_day),
+        DASHBOARD_TABLES,
+        lambda: _dashboard_stats(db, start_day, end_day)
+    )
+
+
+@router.get("/cache/stats")
+async def get_report_cache_stats(
+    current_user: User = Depends(get_admin_user)
+):
+    """Статистика попаданий в кэш отчетов (только администратор)"""
+    return report_cache.stats()
+
+
+# Расчеты, доступные для фонового выполнения
+REPORT_JOB_COMPUTATIONS = {
+    ReportKind.CASH: _cash_report,
+    ReportKind.SALES: _sales_report,
+    ReportKind.WORKERS: _workers_report,
+    ReportKind.DASHBOARD_STATS: _dashboard_stats,
+}
+
+
+@router.post("/jobs", response_model=ReportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_report_job(
+    job_in: ReportJobCreate,
+    current_user: User = Depends(get_admin_user)
+):
+    """Запуск расчета отчета в фоне (только администратор)"""
+    start_day, end_day = _day_range(job_in.start_date, job_in.end_date)
+    if job_in.report == ReportKind.DASHBOARD_STATS:
+        end_day = end_day or datetime.utcnow().date()
+        start_day = start_day or end_day - timedelta(days=30)
+    if start_day and end_day and start_day > end_day:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date не может быть позже end_date"
+        )
+
+    compute = REPORT_JOB_COMPUTATIONS[job_in.report]
+    return report_jobs.submit(
+        job_in.report.value,
+        {"start_date": job_in.start_date, "end_date": job_in.end_date},
+        current_user.id,
+        lambda db: compute(db, start_day, end_day)
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=ReportJobResponse)
+async def get_report_job(
+    job_id: str,
+    current_user: User = Depends(get_admin_user)
+):
+    """Статус фонового расчета отчета (только администратор)"""
+    job = report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задание не найдено"
+        )
+    return job
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_report_job_result(
+    job_id: str,
+    current_user: User = Depends(get_admin_user)
+):
+    """Результат фонового расчета отчета (только администратор)"""
+    job = report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задание не найдено"
+        )
+    if job["status"] != ReportJobStatus.DONE.value:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Отчет еще не готов (статус: {job['status']})"
+        )
+    return FileResponse(
+        report_jobs.result_path(job_id),
+        media_type="application/json",
+        filename=f"{job['report']}_{job_id}.json"
+    )
@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session, selectinload
 from typing import List
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
 
 from app.core.dependencies import get_admin_user
 from app.core.security import get_current_active_user
 from app.core.database import get_db
 from app.models.user import User
 from app.models.salary_payment import SalaryPayment, PaymentType
+from app.models.work_log import WorkLog
+from app.models.payroll_run import PayrollRun, PayrollRunLine
 from app.schemas.salary_payment import SalaryPaymentCreate, SalaryPaymentResponse
+from app.schemas.payroll_run import PayrollRunResponse, PayrollRunDetail
+from app.services import rollups, balances, payroll
 
 router = APIRouter()
 
@@ -26,6 +30,9 @@ async def create_payment(
         comment=payment_in.comment
     )
     db.add(db_payment)
+    db.flush()
+    rollups.record_salary_payment(db, db_payment)
+    balances.record_salary_payment(db, db_payment)
     db.commit()
     db.refresh(db_payment)
     return db_payment
@@ -48,3 +55,76 @@ async def get_payment_history(
     """История всех выплат сотруднику (только админ)"""
     payments = db.query(SalaryPayment).filter(SalaryPayment.worker_id == worker_id).order_by(SalaryPayment.created_at.desc()).all()
     return payments
+
+@router.post("/runs", response_model=PayrollRunDetail, status_code=status.HTTP_201_CREATED)
+async def create_payroll_run(
+    period_end: date,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Расчет зарплаты за период (только админ): все невыплаченные записи о работе
+    по period_end включительно помечаются выплаченными, каждому сотруднику
+    создается выплата за вычетом авансов. Все - в одной транзакции.
+    """
+    run = PayrollRun(period_end=period_end, created_by=current_user.id)
+    db.add(run)
+    db.flush()
+    
+    period_end_at = datetime.combine(period_end + timedelta(days=1), time.min)
+    settled = payroll.settle(
+        db, WorkLog.completed_at < period_end_at,
+        comment=lambda count: f"Расчет №{run.id} по {period_end:%d.%m.%Y}: {count} этапов (с учетом авансов)",
+        period_end=period_end_at
+    )
+    if not settled:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Нет невыплаченных записей за период"
+        )
+    
+    run.lines = [
+        PayrollRunLine(
+            worker_id=worker_id,
+            logs_count=totals["logs_count"],
+            logs_amount=totals["logs_amount"],
+            balance_before=totals["balance"],
+            amount=totals["payment"].amount if totals["payment"] else 0,
+            salary_payment_id=totals["payment"].id if totals["payment"] else None
+        )
+        for worker_id, totals in sorted(settled.items())
+    ]
+    run.workers_count = len(run.lines)
+    run.logs_count = sum(line.logs_count for line in run.lines)
+    run.logs_amount = sum(line.logs_amount for line in run.lines)
+    run.total_paid = sum(line.amount for line in run.lines)
+    
+    db.commit()
+    db.refresh(run)
+    return run
+
+@router.get("/runs", response_model=List[PayrollRunResponse])
+async def get_payroll_runs(
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Список расчетов зарплаты, новые первыми (только админ)"""
+    return db.query(PayrollRun).order_by(PayrollRun.id.desc()).offset(skip).limit(limit).all()
+
+@router.get("/runs/{run_id}", response_model=PayrollRunDetail)
+async def get_payroll_run(
+    run_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Расчет зарплаты с разбивкой по сотрудникам (только админ)"""
+    run = db.query(PayrollRun).options(selectinload(PayrollRun.lines)).filter(PayrollRun.id == run_id).first()
+    if not run:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Расчет не найден"
+        )
+    return run
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import literal_column, select, table, column
+from sqlalchemy.orm import Session
+
+from app.core.security import get_current_active_user
+from app.core.database import get_db
+from app.models.user import User, UserRole
+from app.models.order import Order
+from app.models.product import Product
+from app.services.search import match_query
+from app.services.order_filters import order_filters
+
+router = APIRouter()
+
+
+def _hits(name: str):
+    """FTS-таблица как объект для select: rowid = id исходной строки, rank - релевантность"""
+    return table(name, column("rowid"), column("rank"))
+
+
+def _search(db: Session, fts_name: str, model, columns: list, match: str, limit: int, *filters) -> list:
+    fts = _hits(fts_name)
+    statement = select(*columns).join(
+        fts, fts.c.rowid == model.id
+    ).where(
+        literal_column(fts_name).op("MATCH")(match), *filters
+    ).order_by(fts.c.rank).limit(limit)
+    return [dict(row) for row in db.execute(statement).mappings()]
+
+
+@router.get("/")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Поиск по префиксам слов: заказы (имя, телефон, адрес клиента),
+    товары (название, описание) и пользователи (имя, логин, телефон).
+    Результаты отсортированы по релевантности; видимость - как в списках разделов.
+    """
+    result = {"orders": [], "products": [], "users": []}
+    match = match_query(q)
+    if not match:
+        return result
+
+    result["orders"] = _search(
+        db, "orders_fts", Order,
+        [Order.id, Order.status, Order.customer_name, Order.customer_phone,
+         Order.customer_address, Order.deadline, Order.wholesaler_id],
+        match, limit, *order_filters(current_user, None)
+    )
+    result["products"] = _search(
+        db, "products_fts", Product,
+        [Product.id, Product.name, Product.description, Product.price, Product.stock],
+        match, limit
+    )
+    # Список пользователей доступен только администраторам и менеджерам
+    if current_user.role in (UserRole.ADMIN, UserRole.MANAGER):
+        result["users"] = _search(
+            db, "users_fts", User,
+            [User.id, User.full_name, User.username, User.phone, User.role],
+            match, limit
+        )
+    return result
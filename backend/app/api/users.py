@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import List
 from app.core.database import get_db
 from app.core.security import get_current_active_user, get_password_hash
 from app.core.dependencies import get_admin_user
+from app.core.etag import conditional_get
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, UserUpdate, User as UserResponse
 
@@ -118,9 +119,15 @@ async def delete_user(
 
 @router.get("/wholesalers")
 async def get_wholesalers(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
+    not_modified = conditional_get(request, response, ("users",))
+    if not_modified:
+        return not_modified
+    
     wholesalers = db.query(User).filter(User.role == UserRole.WHOLESALER).all()
     return [
         {
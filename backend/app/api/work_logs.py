@@ -1,19 +1,146 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict
 
 from app.core.dependencies import get_admin_user
 from app.core.security import get_current_active_user
 from app.core.database import get_db
+from app.core.export import ExportFormat, stream_export
 from app.models.user import User, UserRole
 from app.models.work_log import WorkLog
 from app.models.production_stage import ProductionStage
 from app.models.order import Order
-from app.schemas.work_log import WorkLogCreate, WorkLogResponse, MarkAsPaid
+from app.models.product import Product
+from app.schemas.work_log import (
+    WorkLogCreate, WorkLogResponse, MarkAsPaid, WorkLogBatchResult,
+    WorkLogSyncEntry, WorkLogSyncStatus, WorkLogSyncAck
+)
+from app.models.worker_balance import WorkerBalance
+from app.models.work_log_sync_key import WorkLogSyncKey
+from app.services import rollups, balances, stage_graph, inventory, stock, payroll
 
 router = APIRouter()
 
+MAX_WORK_LOG_BATCH_SIZE = 500
+SYNC_KEY_TTL_DAYS = 7
+
+
+def _complete_order_if_done(db: Session, order_id: int, stage_id: int):
+    """Переводит заказ в DONE, если на последнем этапе выполнено все количество заказа"""
+    from app.models.order import OrderStatus
+    order = db.query(Order).filter(Order.id == order_id).first()
+    if order and order.status == OrderStatus.IN_PROGRESS:
+        # Счетчик уже учитывает новые записи (обновлен в record_work_log)
+        completed_qty = rollups.completed_quantity(db, order.id, stage_id)
+        
+        # Если выполнено >= количества заказа, переводим статус в "Готов"
+        if completed_qty >= order.quantity:
+            order.status = OrderStatus.DONE
+            print(f"✅ Заказ #{order.id} автоматически переведен в статус DONE (готов к выдаче)")
+
+
+def _utc(value: datetime) -> datetime:
+    """Время клиента в UTC без tzinfo (для сравнения наивных и aware значений)"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _apply_work_logs(db: Session, worker: User, entries: list) -> list:
+    """
+    Проводит записи о работе сотрудника в текущей транзакции (без коммита).
+    Этапы и остатки загружаются один раз на все записи, перемещения по складу
+    применяются суммарно. Записи с client_timestamp (офлайн-очередь) датируются
+    временем клиента, но не позже текущего. Возвращает по элементу на запись:
+    WorkLog или HTTPException с причиной отказа (такая запись пропускается).
+    """
+    from app.models.production_inventory import ProductionInventory
+    graphs = stage_graph.get_graphs(db, {entry.product_id for entry in entries})
+    available = {
+        (product_id, stage_id): quantity
+        for product_id, stage_id, quantity in db.query(
+            ProductionInventory.product_id, ProductionInventory.stage_id, ProductionInventory.quantity
+        ).filter(ProductionInventory.product_id.in_(list(graphs))).all()
+    } if graphs else {}
+    
+    outcomes = []
+    moves = defaultdict(int)  # (product_id, stage_id) -> изменение остатка
+    finished = defaultdict(int)  # product_id -> зачисление на основной склад
+    now = datetime.utcnow()
+    for entry in entries:
+        # 1. Проверяем этап (по графу этапов товара)
+        graph = graphs.get(entry.product_id)
+        stage = graph.get(entry.stage_id) if graph else None
+        if not stage:
+            outcomes.append(HTTPException(status_code=404, detail="Этап не найден"))
+            continue
+        if entry.quantity <= 0:
+            outcomes.append(HTTPException(status_code=400, detail="Количество должно быть больше нуля"))
+            continue
+        
+        # 2. Проверяем наличие на предыдущем этапе с учетом уже проведенных записей
+        prev_key = (entry.product_id, stage.prev_id)
+        left = available.get(prev_key, 0) + moves[prev_key]
+        if left < entry.quantity:
+            outcomes.append(HTTPException(
+                status_code=400,
+                detail=f"Недостаточно заготовок на предыдущем этапе. Доступно: {left}"
+            ))
+            continue
+        
+        # 3. Если это ПОСЛЕДНИЙ этап - зачисляем на основной склад, иначе переносим на текущий этап
+        moves[prev_key] -= entry.quantity
+        if stage.id == graph.last.id:
+            finished[entry.product_id] += entry.quantity
+        else:
+            moves[(entry.product_id, stage.id)] += entry.quantity
+        
+        # 4. Создаем лог (работа из офлайн-очереди относится к дню, когда она выполнена)
+        client_timestamp = getattr(entry, "client_timestamp", None)
+        completed_at = min(_utc(client_timestamp), now) if client_timestamp else now
+        outcomes.append(WorkLog(
+            product_id=entry.product_id,
+            order_id=entry.order_id,
+            worker_id=worker.id,
+            stage_id=entry.stage_id,
+            quantity=entry.quantity,
+            payment=stage.payment * entry.quantity,
+            completed_at=completed_at
+        ))
+    
+    # Списания - условными UPDATE: остаток мог измениться параллельным запросом
+    for (product_id, stage_id), delta in moves.items():
+        if delta < 0 and not inventory.remove(db, product_id, stage_id, -delta):
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Остатки на этапах изменились во время обработки, повторите запрос"
+            )
+    for (product_id, stage_id), delta in moves.items():
+        if delta > 0:
+            inventory.add(db, product_id, stage_id, delta)
+    stock.add_many(db, finished)
+    
+    work_logs = [outcome for outcome in outcomes if isinstance(outcome, WorkLog)]
+    db.add_all(work_logs)
+    db.flush()
+    for work_log in work_logs:
+        rollups.record_work_log(db, work_log)
+        balances.record_work_log(db, work_log)
+    
+    # 5. Автоматическое обновление статуса заказов, по которым завершен последний этап
+    for order_id, stage_id in {
+        (log.order_id, log.stage_id) for log in work_logs
+        if log.order_id and graphs[log.product_id].last.id == log.stage_id
+    }:
+        _complete_order_if_done(db, order_id, stage_id)
+    
+    return outcomes
+
 
 @router.post("/", response_model=WorkLogResponse, status_code=status.HTTP_201_CREATED)
 async def create_work_log(
@@ -25,97 +152,151 @@ async def create_work_log(
     if current_user.role != UserRole.WORKER:
         raise HTTPException(status_code=403, detail="Только воркеры")
     
-    # 1. Проверяем этап
-    stage = db.query(ProductionStage).filter(ProductionStage.id == work_log_in.stage_id).first()
-    if not stage:
-        raise HTTPException(status_code=404, detail="Этап не найден")
+    outcome, = _apply_work_logs(db, current_user, [work_log_in])
+    if isinstance(outcome, HTTPException):
+        raise outcome
     
-    # 2. Проверяем наличие на предыдущем этапе
-    from app.models.production_inventory import ProductionInventory
-    prev_stage_id = 0
-    if stage.order_num > 1:
-        prev_stage = db.query(ProductionStage).filter(
-            ProductionStage.product_id == work_log_in.product_id,
-            ProductionStage.order_num == stage.order_num - 1
-        ).first()
-        if prev_stage:
-            prev_stage_id = prev_stage.id
-    
-    inv_prev = db.query(ProductionInventory).filter(
-        ProductionInventory.product_id == work_log_in.product_id,
-        ProductionInventory.stage_id == prev_stage_id
-    ).first()
-    
-    if not inv_prev or inv_prev.quantity < work_log_in.quantity:
-        raise HTTPException(status_code=400, detail=f"Недостаточно заготовок на предыдущем этапе. Доступно: {inv_prev.quantity if inv_prev else 0}")
-    
-    # 3. Перемещаем
-    inv_prev.quantity -= work_log_in.quantity
-    
-    inv_curr = db.query(ProductionInventory).filter(
-        ProductionInventory.product_id == work_log_in.product_id,
-        ProductionInventory.stage_id == stage.id
-    ).first()
-    
-    if not inv_curr:
-        inv_curr = ProductionInventory(product_id=work_log_in.product_id, stage_id=stage.id, quantity=0)
-        db.add(inv_curr)
-    
-    inv_curr.quantity += work_log_in.quantity
-    
-    # 4. Если это ПОСЛЕДНИЙ этап - зачисляем на основной склад
-    from app.models.product import Product
-    all_stages = db.query(ProductionStage).filter(ProductionStage.product_id == work_log_in.product_id).all()
-    max_order_num = max(s.order_num for s in all_stages)
-    
-    if stage.order_num == max_order_num:
-        product = db.query(Product).filter(Product.id == work_log_in.product_id).first()
-        product.stock += work_log_in.quantity
-        # После последнего этапа убираем из WIP
-        inv_curr.quantity -= work_log_in.quantity
-        
-    # 5. Создаем лог
-    db_work_log = WorkLog(
-        product_id=work_log_in.product_id,
-        order_id=work_log_in.order_id,
-        worker_id=current_user.id,
-        stage_id=work_log_in.stage_id,
-        quantity=work_log_in.quantity,
-        payment=stage.payment * work_log_in.quantity,
-        completed_at=datetime.utcnow()
-    )
+    db.commit()
+    db.refresh(outcome)
+    return outcome
+
+
+@router.post("/batch", response_model=List[WorkLogBatchResult])
+async def create_work_logs_batch(
+    entries: List[WorkLogCreate],
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Пакетная фиксация выполненной работы в одной транзакции.
+    Записи проводятся по порядку; ошибочные пропускаются и возвращаются с причиной.
+    """
+    if current_user.role != UserRole.WORKER:
+        raise HTTPException(status_code=403, detail="Только воркеры")
+    if len(entries) > MAX_WORK_LOG_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Слишком много записей (не более {MAX_WORK_LOG_BATCH_SIZE})"
+        )
     
+    outcomes = _apply_work_logs(db, current_user, entries)
+    db.commit()
     
-    db.add(db_work_log)
-    
-    # 6. Автоматическое обновление статуса заказа
-    if work_log_in.order_id and stage.order_num == max_order_num:
-        # Если завершили последний этап, проверяем готовность заказа
-        order = db.query(Order).filter(Order.id == work_log_in.order_id).first()
-        if order:
-            # Проверяем, вся ли продукция заказа прошла все этапы
-            total_completed = db.query(WorkLog).filter(
-                WorkLog.order_id == order.id,
-                WorkLog.stage_id == stage.id
-            ).count()
-            
-            # Проверяем количество выполненных работ на последнем этапе
-            completed_qty = sum([
-                log.quantity for log in db.query(WorkLog).filter(
-                    WorkLog.order_id == order.id,
-                    WorkLog.stage_id == stage.id
-                ).all()
-            ])
-            
-            # Если выполнено >= количества заказа, переводим статус в "Готов"
-            from app.models.order import OrderStatus
-            if completed_qty >= order.quantity and order.status == OrderStatus.IN_PROGRESS:
-                order.status = OrderStatus.DONE
-                print(f"✅ Заказ #{order.id} автоматически переведен в статус DONE (готов к выдаче)")
+    return [
+        WorkLogBatchResult(index=i, success=False, detail=outcome.detail)
+        if isinstance(outcome, HTTPException)
+        else WorkLogBatchResult(index=i, success=True, work_log_id=outcome.id)
+        for i, outcome in enumerate(outcomes)
+    ]
+
+
+@router.post("/sync", response_model=List[WorkLogSyncAck])
+async def sync_work_logs(
+    entries: List[WorkLogSyncEntry],
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Синхронизация очереди записей о работе, накопленной сканером офлайн.
+    Записи проводятся в порядке client_timestamp; запись с уже известным
+    idempotency_key не проводится повторно, поэтому очередь можно безопасно
+    отправлять снова после обрыва связи.
+    """
+    if current_user.role != UserRole.WORKER:
+        raise HTTPException(status_code=403, detail="Только воркеры")
+    if len(entries) > MAX_WORK_LOG_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Слишком много записей (не более {MAX_WORK_LOG_BATCH_SIZE})"
+        )
     
-    db.commit()
-    db.refresh(db_work_log)
-    return db_work_log
+    now = datetime.utcnow()
+    # Просроченные ключи удаляем по индексу expires_at
+    db.query(WorkLogSyncKey).filter(WorkLogSyncKey.expires_at < now).delete()
+    
+    entries = sorted(entries, key=lambda entry: _utc(entry.client_timestamp))
+    keys = {entry.idempotency_key for entry in entries}
+    known = dict(
+        db.query(WorkLogSyncKey.idempotency_key, WorkLogSyncKey.work_log_id).filter(
+            WorkLogSyncKey.worker_id == current_user.id,
+            WorkLogSyncKey.idempotency_key.in_(list(keys))
+        ).all()
+    ) if keys else {}
+    
+    # Повторы (ранее проведенные или повторенные внутри очереди) не проводим
+    fresh = []
+    seen = set()
+    for entry in entries:
+        if entry.idempotency_key not in known and entry.idempotency_key not in seen:
+            fresh.append(entry)
+        seen.add(entry.idempotency_key)
+    
+    outcomes = dict(zip(
+        (entry.idempotency_key for entry in fresh),
+        _apply_work_logs(db, current_user, fresh)
+    ))
+    expires_at = now + timedelta(days=SYNC_KEY_TTL_DAYS)
+    db.add_all([
+        WorkLogSyncKey(
+            worker_id=current_user.id,
+            idempotency_key=key,
+            work_log_id=outcome.id,
+            expires_at=expires_at
+        )
+        for key, outcome in outcomes.items() if isinstance(outcome, WorkLog)
+    ])
+    try:
+        db.commit()
+    except IntegrityError:
+        # Та же очередь проводится параллельным запросом
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Очередь уже синхронизируется, повторите запрос"
+        )
+    
+    acks = []
+    reported = set()
+    for entry in entries:
+        key = entry.idempotency_key
+        outcome = outcomes.get(key) if key not in reported else None
+        reported.add(key)
+        if isinstance(outcome, WorkLog):
+            acks.append(WorkLogSyncAck(key=key, status=WorkLogSyncStatus.APPLIED, work_log_id=outcome.id))
+        elif isinstance(outcome, HTTPException):
+            acks.append(WorkLogSyncAck(key=key, status=WorkLogSyncStatus.REJECTED, detail=outcome.detail))
+        else:
+            original = outcomes.get(key)
+            work_log_id = original.id if isinstance(original, WorkLog) else known.get(key)
+            acks.append(WorkLogSyncAck(key=key, status=WorkLogSyncStatus.DUPLICATE, work_log_id=work_log_id))
+    return acks
+
+
+def _work_log_filters(
+    current_user: User,
+    worker_id: Optional[int],
+    is_paid: Optional[bool],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime]
+) -> list:
+    """Условия выборки записей о работе с учетом роли пользователя"""
+    filters = []
+    
+    # Сотрудники видят только свои записи
+    if current_user.role == UserRole.WORKER:
+        filters.append(WorkLog.worker_id == current_user.id)
+    elif worker_id:
+        filters.append(WorkLog.worker_id == worker_id)
+    
+    if is_paid is not None:
+        filters.append(WorkLog.is_paid == is_paid)
+    
+    if start_date:
+        filters.append(WorkLog.completed_at >= start_date)
+    if end_date:
+        filters.append(WorkLog.completed_at <= end_date)
+    
+    return filters
 
 
 @router.get("/", response_model=List[WorkLogResponse])
@@ -130,26 +311,51 @@ async def get_work_logs(
     current_user: User = Depends(get_current_active_user)
 ):
     """Получение списка записей о работе"""
-    query = db.query(WorkLog)
-    
-    # Сотрудники видят только свои записи
-    if current_user.role == UserRole.WORKER:
-        query = query.filter(WorkLog.worker_id == current_user.id)
-    elif worker_id:
-        query = query.filter(WorkLog.worker_id == worker_id)
-    
-    if is_paid is not None:
-        query = query.filter(WorkLog.is_paid == is_paid)
-    
-    if start_date:
-        query = query.filter(WorkLog.completed_at >= start_date)
-    if end_date:
-        query = query.filter(WorkLog.completed_at <= end_date)
+    query = db.query(WorkLog).filter(
+        *_work_log_filters(current_user, worker_id, is_paid, start_date, end_date)
+    )
     
     work_logs = query.offset(skip).limit(limit).all()
     return work_logs
 
 
+@router.get("/export")
+async def export_work_logs(
+    worker_id: int = None,
+    is_paid: bool = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    fmt: ExportFormat = Query(ExportFormat.CSV, alias="format"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Потоковая выгрузка записей о работе (CSV / NDJSON) с теми же фильтрами, что и список"""
+    statement = select(
+        WorkLog.id,
+        WorkLog.completed_at,
+        WorkLog.worker_id,
+        User.full_name.label("worker_name"),
+        WorkLog.order_id,
+        WorkLog.product_id,
+        Product.name.label("product_name"),
+        WorkLog.stage_id,
+        ProductionStage.name.label("stage_name"),
+        WorkLog.quantity,
+        WorkLog.payment,
+        WorkLog.is_paid
+    ).outerjoin(
+        User, User.id == WorkLog.worker_id
+    ).outerjoin(
+        Product, Product.id == WorkLog.product_id
+    ).outerjoin(
+        ProductionStage, ProductionStage.id == WorkLog.stage_id
+    ).where(
+        *_work_log_filters(current_user, worker_id, is_paid, start_date, end_date)
+    ).order_by(WorkLog.id)
+    
+    return stream_export(db, statement, "work_logs", fmt)
+
+
 @router.get("/my-salary")
 async def get_my_salary(
     db: Session = Depends(get_db),
@@ -162,28 +368,21 @@ async def get_my_salary(
             detail="Доступно только для сотрудников"
         )
     
-    # Все начисления за всё время
-    all_logs = db.query(WorkLog).filter(WorkLog.worker_id == current_user.id).all()
-    total_earned = sum(log.payment for log in all_logs)
-    
-    # Все выплаты за всё время
-    from app.models.salary_payment import SalaryPayment, PaymentType
-    payments = db.query(SalaryPayment).filter(SalaryPayment.worker_id == current_user.id).all()
-    
-    total_paid_manual = sum(p.amount for p in payments if p.payment_type == PaymentType.SALARY)
-    total_advances = sum(p.amount for p in payments if p.payment_type == PaymentType.ADVANCE)
-    total_all_money = sum(p.amount for p in payments)
-    
-    # Баланс = Заработано - Выплачено
-    current_balance = total_earned - total_all_money
+    balance = db.query(WorkerBalance).filter(WorkerBalance.worker_id == current_user.id).first()
+    if not balance:
+        balance = WorkerBalance(
+            worker_id=current_user.id,
+            total_earned=0, total_paid=0, total_advances=0, unpaid_amount=0, unpaid_count=0
+        )
     
     return {
-        "total_earned": total_earned,
-        "total_paid": total_paid_manual, 
-        "total_unpaid": sum(log.payment for log in all_logs if not log.is_paid),
-        "total_advances": total_advances,
-        "current_balance": current_balance,
-        "unpaid_count": len([l for l in all_logs if not l.is_paid])
+        "total_earned": balance.total_earned,
+        "total_paid": balance.total_paid, 
+        "total_unpaid": balance.unpaid_amount,
+        "total_advances": balance.total_advances,
+        # Баланс = Заработано - Выплачено
+        "current_balance": balance.current_balance,
+        "unpaid_count": balance.unpaid_count
     }
 
 
@@ -194,47 +393,17 @@ async def mark_as_paid(
     current_user: User = Depends(get_admin_user)
 ):
     """Отметить записи о работе как выплаченные (только администратор)"""
-    work_logs = db.query(WorkLog).filter(WorkLog.id.in_(data.work_log_ids)).all()
+    work_log_ids = set(data.work_log_ids)
+    found = db.query(func.count(WorkLog.id)).filter(WorkLog.id.in_(list(work_log_ids))).scalar()
     
-    if len(work_logs) != len(data.work_log_ids):
+    if found != len(work_log_ids):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Некоторые записи не найдены"
         )
     
-    # Группируем логи по сотрудникам
-    from collections import defaultdict
-    worker_log_totals = defaultdict(float)
-    for work_log in work_logs:
-        if not work_log.is_paid:
-            work_log.is_paid = True
-            work_log.paid_at = datetime.utcnow()
-            worker_log_totals[work_log.worker_id] += work_log.payment
-    
-    # Создаем записи о выплатах с учетом авансов
-    from app.models.salary_payment import SalaryPayment, PaymentType
-    for worker_id, logs_amount in worker_log_totals.items():
-        # Считаем текущий баланс ДО этой выплаты
-        # Баланс = Заработано_всего - Выплачено_всего
-        all_earned = sum(l.payment for l in db.query(WorkLog).filter(WorkLog.worker_id == worker_id).all())
-        all_paid = sum(p.amount for p in db.query(SalaryPayment).filter(SalaryPayment.worker_id == worker_id).all())
-        
-        # До выплаты этих логов (которые уже помечены paid), заработано было столько же.
-        # Но баланс показывает сколько мы ДОЛЖНЫ.
-        # Если баланс 80к, а логи на 100к, значит 20к уже было выдано авансом.
-        current_balance = all_earned - all_paid
-        
-        # Мы выплачиваем только то, что реально должны (не более суммы логов и не меньше 0)
-        actual_payout = max(0, min(logs_amount, current_balance))
-        
-        if actual_payout > 0:
-            db_payment = SalaryPayment(
-                worker_id=worker_id,
-                amount=actual_payout,
-                payment_type=PaymentType.SALARY,
-                comment=f"Выплата за {len(work_logs)} этапов (с учетом авансов)"
-            )
-            db.add(db_payment)
+    # Помечаем записи и создаем выплаты с учетом авансов (постоянное число запросов)
+    payroll.settle(db, WorkLog.id.in_(list(work_log_ids)))
     
     db.commit()
     return {"message": "Успешно обновлено"}
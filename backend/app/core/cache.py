@@ -0,0 +1,122 @@
+"""
+Кэш результатов отчетов с инвалидацией по версиям таблиц.
+
+Для каждой таблицы хранится счетчик версий. Счетчики увеличиваются после
+коммита сессии, в которой были записи в таблицу (ORM flush или
+session.execute(insert/update/delete)). Запись кэша действительна, пока
+версии таблиц, от которых зависит отчет, не изменились и не истек TTL.
+
+Кэш и счетчики живут в памяти процесса: при нескольких воркерах у каждого
+свой кэш, а записи из других процессов видны только после истечения TTL.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+REPORT_CACHE_SIZE = 256
+REPORT_CACHE_TTL_SECONDS = 300
+
+_versions = defaultdict(int)
+_versions_lock = threading.Lock()
+
+
+def table_versions(tables) -> tuple:
+    """Текущие версии перечисленных таблиц"""
+    with _versions_lock:
+        return tuple(_versions[table] for table in tables)
+
+
+def bump_tables(*tables: str):
+    """Помечает таблицы измененными (для записей в обход сессии, например сырым SQL)"""
+    with _versions_lock:
+        for table in tables:
+            _versions[table] += 1
+
+
+def _changed_tables(session: Session) -> set:
+    return session.info.setdefault("changed_tables", set())
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    changed = _changed_tables(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            changed.add(table.name)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _changed_tables(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        bump_tables(*changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("changed_tables", None)
+
+
+class ReportCache:
+    """LRU-кэш с TTL, записи которого привязаны к версиям таблиц"""
+
+    def __init__(self, maxsize: int = REPORT_CACHE_SIZE, ttl: float = REPORT_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, tables, compute):
+        """
+        Возвращает закэшированный результат для key или вычисляет его через compute().
+        Версии снимаются до вычисления, чтобы запись, закоммиченная во время
+        расчета, не оставила в кэше устаревший результат.
+        """
+        versions = table_versions(tables)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = (versions, now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl
+            }
+
+
+report_cache = ReportCache()
@@ -0,0 +1,50 @@
+"""
+Условные GET-запросы (ETag / If-None-Match) для редко меняющихся справочников.
+
+ETag строится из версий таблиц (app/core/cache.py), токена запуска процесса
+(счетчики версий обнуляются при перезапуске) и номера интервала TTL
+(записи из других процессов не видны счетчикам этого процесса). Если
+клиент прислал актуальный ETag, эндпоинт отвечает 304 без запросов к БД
+и сериализации.
+"""
+import time
+import uuid
+from typing import Optional
+from fastapi import Request, Response, status
+
+from app.core.cache import table_versions, REPORT_CACHE_TTL_SECONDS
+
+CACHE_CONTROL = "private, no-cache"
+
+_BOOT_TOKEN = uuid.uuid4().hex[:12]
+
+
+def make_etag(tables, *key) -> str:
+    """Сильный ETag для данных из tables (key различает ресурсы, например id)"""
+    epoch = int(time.time() // REPORT_CACHE_TTL_SECONDS)
+    parts = [_BOOT_TOKEN, str(epoch)] + [str(v) for v in table_versions(tables)] + [str(k) for k in key]
+    return '"' + "-".join(parts) + '"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def conditional_get(request: Request, response: Response, tables, *key) -> Optional[Response]:
+    """
+    Проставляет ETag и Cache-Control в response. Возвращает готовый ответ 304,
+    если копия клиента актуальна, иначе None - эндпоинт формирует ответ как обычно.
+    Вызывается до чтения данных, чтобы запись во время запроса не получила старый ETag.
+    """
+    etag = make_etag(tables, *key)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
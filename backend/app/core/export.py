@@ -0,0 +1,74 @@
+"""
+Потоковая выгрузка результатов запроса в CSV / NDJSON.
+
+Строки читаются порциями (yield_per) в отдельной сессии, которая живет
+столько же, сколько ответ, поэтому выгрузка любого объема идет с
+постоянным расходом памяти и начинает отдавать данные сразу.
+"""
+import csv
+import enum
+import io
+import json
+from datetime import date, datetime
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+EXPORT_BATCH_SIZE = 1000
+
+
+class ExportFormat(str, enum.Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def _csv_chunk(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_plain(v) for v in row] for row in rows)
+    return buffer.getvalue()
+
+
+def _ndjson_chunk(columns, rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(columns, (_plain(v) for v in row))), ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def stream_export(db: Session, statement, filename: str, fmt: ExportFormat) -> StreamingResponse:
+    """Отдает результат select-запроса потоком в формате fmt"""
+    bind = db.get_bind()
+
+    def generate():
+        session = Session(bind=bind)
+        try:
+            result = session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            columns = list(result.keys())
+            if fmt == ExportFormat.CSV:
+                # BOM, чтобы Excel правильно открыл кириллицу
+                yield "\ufeff" + _csv_chunk([columns])
+            for rows in result.partitions():
+                if fmt == ExportFormat.CSV:
+                    yield _csv_chunk(rows)
+                else:
+                    yield _ndjson_chunk(columns, rows)
+        finally:
+            session.close()
+
+    if fmt == ExportFormat.CSV:
+        media_type = "text/csv; charset=utf-8"
+    else:
+        media_type = "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt.value}"'}
+    )
@@ -1,6 +1,29 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth, users, products, orders, production, work_logs, salaries, expenses, reports
+from sqlalchemy import inspect
+from app.api import auth, users, products, orders, production, work_logs, salaries, expenses, reports, search
+from app.core.database import Base, engine
+from app.services import inventory, rollups, balances
+from app.services.search import ensure_search_index
+from app.services.sales import ensure_order_item_prices
+
+# Создаем недостающие таблицы (существующие не изменяются)
+existing_tables = set(inspect(engine).get_table_names())
+Base.metadata.create_all(bind=engine)
+inventory.ensure_unique_key(engine)
+ensure_search_index(engine)
+
+# Индексы, добавленные в модели после создания таблиц
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+# Цены и себестоимость в позициях старых заказов - до пересборки сводок, которые их читают
+ensure_order_item_prices(engine)
+
+# Только что созданные сводные таблицы и балансы заполняем по уже существующим данным
+rollups.ensure_rollups(engine, existing_tables)
+balances.ensure_balances(engine)
 
 app = FastAPI(title="Production Management API")
 
@@ -23,6 +46,7 @@ app.include_router(work_logs.router, prefix="/api/v1/work-logs", tags=["work-log
 app.include_router(salaries.router, prefix="/api/v1/salaries", tags=["salaries"])
 app.include_router(expenses.router, prefix="/api/v1/expenses", tags=["expenses"])
 app.include_router(reports.router, prefix="/api/v1/reports", tags=["reports"])
+app.include_router(search.router, prefix="/api/v1/search", tags=["search"])
 
 @app.get("/")
 async def root():
@@ -8,6 +8,10 @@ from app.models.production_inventory import ProductionInventory
 from app.models.salary_payment import SalaryPayment, PaymentType
 from app.models.expense import Expense, ExpenseType
 from app.models.cash_withdrawal import CashWithdrawal
+from app.models.rollup import DailySales, DailyExpense, DailyWorkerOutput, DailySalaryPayment, OrderStageProgress
+from app.models.worker_balance import WorkerBalance
+from app.models.work_log_sync_key import WorkLogSyncKey
+from app.models.payroll_run import PayrollRun, PayrollRunLine
 
 __all__ = [
     "User", "UserRole",
@@ -18,5 +22,9 @@ __all__ = [
     "ProductionInventory",
     "SalaryPayment", "PaymentType",
     "Expense", "ExpenseType",
-    "CashWithdrawal"
+    "CashWithdrawal",
+    "DailySales", "DailyExpense", "DailyWorkerOutput", "DailySalaryPayment", "OrderStageProgress",
+    "WorkerBalance",
+    "WorkLogSyncKey",
+    "PayrollRun", "PayrollRunLine"
 ]
@@ -17,7 +17,7 @@ class Expense(Base):
     expense_type = Column(SQLEnum(ExpenseType), nullable=False)
     description = Column(String, nullable=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     # Relationships
     product = relationship("Product")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Float, String, Enum as SQLEnum
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Float, String, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -19,11 +19,11 @@ class Order(Base):
     # product_id и quantity остаются для обратной совместимости, но теперь nullable
     product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=True)
     quantity = Column(Integer, nullable=True)
-    deadline = Column(DateTime, nullable=False)
+    deadline = Column(DateTime, nullable=False, index=True)
     status = Column(SQLEnum(OrderStatus), default=OrderStatus.PENDING, nullable=False)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     wholesaler_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     delivered_at = Column(DateTime, nullable=True)
 
@@ -44,7 +44,13 @@ class Order(Base):
     work_logs = relationship("WorkLog", back_populates="order", cascade="all, delete-orphan")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
     
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_orders_status_delivered_at", "status", "delivered_at"),
+        # Фильтры по роли (сотрудник - статус, оптовик - свои заказы) + сортировка списка
+        Index("ix_orders_status_created_at", "status", "created_at"),
+        Index("ix_orders_wholesaler_created_at", "wholesaler_id", "created_at"),
+        {'extend_existing': True}
+    )
 
     def __repr__(self):
         return f"<Order(id={self.id}, status='{self.status}')>"
@@ -53,10 +59,11 @@ class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
     quantity = Column(Integer, nullable=False)
     price_at_order = Column(Float, nullable=True)  # Цена на момент заказа
+    cost_at_order = Column(Float, nullable=True)  # Себестоимость на момент заказа
 
     # Relationships
     order = relationship("Order", back_populates="items")
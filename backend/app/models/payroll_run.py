@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.core.database import Base
+
+class PayrollRun(Base):
+    """Расчет зарплаты за период: все невыплаченные записи о работе по period_end включительно"""
+    __tablename__ = "payroll_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    period_end = Column(Date, nullable=False)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    workers_count = Column(Integer, nullable=False, default=0)
+    logs_count = Column(Integer, nullable=False, default=0)
+    logs_amount = Column(Float, nullable=False, default=0)  # Заработано по закрытым записям
+    total_paid = Column(Float, nullable=False, default=0)  # Выплачено (за вычетом авансов)
+
+    # Relationships
+    lines = relationship("PayrollRunLine", back_populates="run", cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f"<PayrollRun(id={self.id}, period_end={self.period_end}, total_paid={self.total_paid})>"
+
+class PayrollRunLine(Base):
+    __tablename__ = "payroll_run_lines"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("payroll_runs.id", ondelete="CASCADE"), nullable=False, index=True)
+    worker_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    logs_count = Column(Integer, nullable=False, default=0)
+    logs_amount = Column(Float, nullable=False, default=0)
+    balance_before = Column(Float, nullable=False, default=0)  # Долг перед сотрудником до расчета
+    amount = Column(Float, nullable=False, default=0)
+    salary_payment_id = Column(Integer, ForeignKey("salary_payments.id"), nullable=True)
+
+    # Relationships
+    run = relationship("PayrollRun", back_populates="lines")
+
+    def __repr__(self):
+        return f"<PayrollRunLine(run_id={self.run_id}, worker_id={self.worker_id}, amount={self.amount})>"
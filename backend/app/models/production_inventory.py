@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 class ProductionInventory(Base):
     __tablename__ = "production_inventory"
+    __table_args__ = (
+        # Одна строка на (товар, этап) - ключ для атомарных UPSERT
+        Index("ux_production_inventory_product_stage", "product_id", "stage_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
@@ -0,0 +1,72 @@
+from sqlalchemy import Column, Integer, Float, Date, Enum as SQLEnum
+from app.core.database import Base
+from app.models.expense import ExpenseType
+from app.models.salary_payment import PaymentType
+
+# Сводные таблицы по дням. Поддерживаются инкрементально при записи
+# (app/services/rollups.py) и пересобираются скриптом rebuild_rollups.py.
+# product_id = 0 / wholesaler_id = 0 означают строку без товара / без оптовика.
+
+class DailySales(Base):
+    __tablename__ = "daily_sales"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    wholesaler_id = Column(Integer, primary_key=True)
+    orders_count = Column(Integer, nullable=False, default=0)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailySales(day={self.day}, product_id={self.product_id}, revenue={self.revenue})>"
+
+class DailyExpense(Base):
+    __tablename__ = "daily_expenses"
+
+    day = Column(Date, primary_key=True)
+    expense_type = Column(SQLEnum(ExpenseType), primary_key=True)
+    expenses_count = Column(Integer, nullable=False, default=0)
+    amount = Column(Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyExpense(day={self.day}, type='{self.expense_type}', amount={self.amount})>"
+
+class DailyWorkerOutput(Base):
+    __tablename__ = "daily_worker_output"
+
+    day = Column(Date, primary_key=True)
+    worker_id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    logs_count = Column(Integer, nullable=False, default=0)
+    quantity = Column(Integer, nullable=False, default=0)
+    earned = Column(Float, nullable=False, default=0)
+    paid = Column(Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyWorkerOutput(day={self.day}, worker_id={self.worker_id}, earned={self.earned})>"
+
+class DailySalaryPayment(Base):
+    __tablename__ = "daily_salary_payments"
+
+    day = Column(Date, primary_key=True)
+    worker_id = Column(Integer, primary_key=True)
+    payment_type = Column(SQLEnum(PaymentType), primary_key=True)
+    payments_count = Column(Integer, nullable=False, default=0)
+    amount = Column(Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailySalaryPayment(day={self.day}, worker_id={self.worker_id}, amount={self.amount})>"
+
+# Выполненное количество по заказу и этапу (для автоматического перевода заказа в DONE).
+# Поддерживается так же, как сводные таблицы по дням.
+
+class OrderStageProgress(Base):
+    __tablename__ = "order_stage_progress"
+
+    order_id = Column(Integer, primary_key=True)
+    stage_id = Column(Integer, primary_key=True)
+    completed_quantity = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<OrderStageProgress(order_id={self.order_id}, stage_id={self.stage_id}, completed={self.completed_quantity})>"
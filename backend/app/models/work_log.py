@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Boolean, Float, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Boolean, Float, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -14,12 +14,17 @@ class WorkLog(Base):
     quantity = Column(Integer, nullable=False)
     payment = Column(Float, nullable=False)
     is_paid = Column(Boolean, default=False)
-    completed_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     # Relationships
     worker = relationship("User", back_populates="work_logs")
     order = relationship("Order", back_populates="work_logs")
     stage = relationship("ProductionStage", back_populates="work_logs")
 
+    __table_args__ = (
+        # Покрывающий индекс для выборок выполненного количества по заказу и этапу
+        Index("ix_work_logs_order_stage_quantity", "order_id", "stage_id", "quantity"),
+    )
+
     def __repr__(self):
         return f"<WorkLog(id={self.id}, worker_id={self.worker_id}, payment={self.payment})>"
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from datetime import datetime
+from app.core.database import Base
+
+class WorkLogSyncKey(Base):
+    """
+    Ключи идемпотентности синхронизации записей о работе (/work-logs/sync).
+    Ключ хранится до expires_at; повтор записи с тем же ключом не проводится второй раз.
+    """
+    __tablename__ = "work_log_sync_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    worker_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    idempotency_key = Column(String, nullable=False)
+    work_log_id = Column(Integer, ForeignKey("work_logs.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("worker_id", "idempotency_key", name="uq_work_log_sync_keys_worker_key"),
+    )
+
+    def __repr__(self):
+        return f"<WorkLogSyncKey(worker_id={self.worker_id}, key='{self.idempotency_key}')>"
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey
+from app.core.database import Base
+
+class WorkerBalance(Base):
+    """
+    Нарастающие итоги по сотруднику. Обновляются в одной транзакции с записью
+    WorkLog / SalaryPayment (app/services/balances.py), сверяются и
+    пересобираются скриптом verify_balances.py.
+    """
+    __tablename__ = "worker_balances"
+
+    worker_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total_earned = Column(Float, nullable=False, default=0)
+    total_paid = Column(Float, nullable=False, default=0)  # Выплаты зарплаты
+    total_advances = Column(Float, nullable=False, default=0)
+    unpaid_amount = Column(Float, nullable=False, default=0)
+    unpaid_count = Column(Integer, nullable=False, default=0)
+
+    @property
+    def current_balance(self) -> float:
+        # Баланс = Заработано - Выплачено (зарплата + авансы)
+        return self.total_earned - self.total_paid - self.total_advances
+
+    def __repr__(self):
+        return f"<WorkerBalance(worker_id={self.worker_id}, balance={self.current_balance})>"
@@ -1,20 +1,32 @@
 # Schemas module initialization
-from app.schemas.order import OrderCreate, OrderResponse, OrderStatusUpdate
-from app.schemas.work_log import WorkLogCreate, WorkLogResponse, MarkAsPaid
+from app.schemas.order import (
+    OrderCreate, OrderResponse, OrderStatusUpdate,
+    OrderStatusBatchItem, OrderStatusBatchResult
+)
+from app.schemas.work_log import (
+    WorkLogCreate, WorkLogResponse, MarkAsPaid, WorkLogBatchResult,
+    WorkLogSyncEntry, WorkLogSyncStatus, WorkLogSyncAck
+)
 from app.schemas.salary_payment import SalaryPaymentCreate, SalaryPaymentResponse
+from app.schemas.payroll_run import PayrollRunLineResponse, PayrollRunResponse, PayrollRunDetail
 from app.schemas.expense import (
     ExpenseCreate, ExpenseResponse, ExpenseUpdate,
     CashWithdrawalCreate, CashWithdrawalResponse
 )
-from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate
+from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate, ProduceItem, ProduceItemResult
 from app.schemas.user import UserCreate, UserUpdate, User as UserResponse
+from app.schemas.report_job import ReportKind, ReportJobStatus, ReportJobCreate, ReportJobResponse
 
 __all__ = [
     "OrderCreate", "OrderResponse", "OrderStatusUpdate",
-    "WorkLogCreate", "WorkLogResponse", "MarkAsPaid",
+    "OrderStatusBatchItem", "OrderStatusBatchResult",
+    "WorkLogCreate", "WorkLogResponse", "MarkAsPaid", "WorkLogBatchResult",
+    "WorkLogSyncEntry", "WorkLogSyncStatus", "WorkLogSyncAck",
     "SalaryPaymentCreate", "SalaryPaymentResponse",
+    "PayrollRunLineResponse", "PayrollRunResponse", "PayrollRunDetail",
     "ExpenseCreate", "ExpenseResponse", "ExpenseUpdate",
     "CashWithdrawalCreate", "CashWithdrawalResponse",
-    "ProductCreate", "ProductResponse", "ProductUpdate",
-    "UserCreate", "UserUpdate", "UserResponse"
+    "ProductCreate", "ProductResponse", "ProductUpdate", "ProduceItem", "ProduceItemResult",
+    "UserCreate", "UserUpdate", "UserResponse",
+    "ReportKind", "ReportJobStatus", "ReportJobCreate", "ReportJobResponse"
 ]
@@ -43,6 +43,19 @@ class OrderStatusUpdate(BaseModel):
     status: OrderStatus
 
 
+class OrderStatusBatchItem(OrderStatusUpdate):
+    """Смена статуса одного заказа в пакетном запросе"""
+    order_id: int
+
+
+class OrderStatusBatchResult(BaseModel):
+    """Результат смены статуса заказа в пакетном запросе"""
+    order_id: int
+    success: bool
+    status: Optional[OrderStatus] = None
+    detail: Optional[str] = None
+
+
 class OrderResponse(OrderBase):
     """Схема ответа заказа"""
     id: int
@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import Optional, List
+
+class PayrollRunLineResponse(BaseModel):
+    worker_id: int
+    logs_count: int
+    logs_amount: float
+    balance_before: float
+    amount: float
+    salary_payment_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class PayrollRunResponse(BaseModel):
+    id: int
+    period_end: date
+    created_by: int
+    created_at: datetime
+    workers_count: int
+    logs_count: int
+    logs_amount: float
+    total_paid: float
+
+    class Config:
+        from_attributes = True
+
+class PayrollRunDetail(PayrollRunResponse):
+    lines: List[PayrollRunLineResponse] = []
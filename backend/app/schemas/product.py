@@ -39,3 +39,13 @@ class ProductResponse(ProductBase):
 
     class Config:
         from_attributes = True
+
+class ProduceItem(BaseModel):
+    product_id: int
+    quantity: int
+
+class ProduceItemResult(BaseModel):
+    product_id: int
+    quantity: int
+    success: bool
+    detail: Optional[str] = None
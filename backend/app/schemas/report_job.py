@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+import enum
+
+class ReportKind(str, enum.Enum):
+    CASH = "cash"
+    SALES = "sales"
+    WORKERS = "workers"
+    DASHBOARD_STATS = "dashboard-stats"
+
+class ReportJobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+class ReportJobCreate(BaseModel):
+    report: ReportKind
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+
+class ReportJobResponse(BaseModel):
+    id: str
+    report: ReportKind
+    status: ReportJobStatus
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    created_by: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
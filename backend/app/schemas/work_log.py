@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
+import enum
 
 class WorkLogBase(BaseModel):
     order_id: Optional[int] = None
@@ -25,3 +26,24 @@ class WorkLogResponse(WorkLogBase):
 
 class MarkAsPaid(BaseModel):
     work_log_ids: list[int]
+
+class WorkLogBatchResult(BaseModel):
+    index: int
+    success: bool
+    work_log_id: Optional[int] = None
+    detail: Optional[str] = None
+
+class WorkLogSyncEntry(WorkLogCreate):
+    idempotency_key: str = Field(..., min_length=1, max_length=64)
+    client_timestamp: datetime
+
+class WorkLogSyncStatus(str, enum.Enum):
+    APPLIED = "applied"      # Запись проведена
+    DUPLICATE = "duplicate"  # Запись с этим ключом уже была проведена ранее
+    REJECTED = "rejected"    # Запись отклонена (причина в detail), ключ не сохраняется
+
+class WorkLogSyncAck(BaseModel):
+    key: str
+    status: WorkLogSyncStatus
+    work_log_id: Optional[int] = None
+    detail: Optional[str] = None
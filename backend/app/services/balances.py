@@ -0,0 +1,150 @@
+"""
+Баланс сотрудников (таблица worker_balances).
+
+record_* вызываются роутерами в той же транзакции, что и запись WorkLog /
+SalaryPayment, поэтому баланс всегда согласован с исходными данными.
+expected_balances() пересчитывает балансы по исходным таблицам и
+используется для сверки (verify) и пересборки (rebuild); ensure_balances()
+пересобирает пустую таблицу при запуске.
+"""
+from collections import defaultdict
+from sqlalchemy import func, select, delete, case, or_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.models.work_log import WorkLog
+from app.models.salary_payment import SalaryPayment, PaymentType
+from app.models.worker_balance import WorkerBalance
+from app.services.counters import increment, increment_many
+
+BALANCE_FIELDS = ["total_earned", "total_paid", "total_advances", "unpaid_amount", "unpaid_count"]
+
+
+def record_work_log(db: Session, work_log: WorkLog):
+    if work_log.is_paid:
+        increment(db, WorkerBalance, {"worker_id": work_log.worker_id}, total_earned=work_log.payment)
+    else:
+        increment(
+            db, WorkerBalance, {"worker_id": work_log.worker_id},
+            total_earned=work_log.payment, unpaid_amount=work_log.payment, unpaid_count=1
+        )
+
+
+def record_work_logs_paid(db: Session, work_logs: list):
+    """Учитывает перевод записей о работе в статус "выплачено" """
+    paid = defaultdict(lambda: [0.0, 0])
+    for log in work_logs:
+        paid[log.worker_id][0] += log.payment
+        paid[log.worker_id][1] += 1
+    increment_many(db, WorkerBalance, ["worker_id"], [
+        {"worker_id": worker_id, "unpaid_amount": -amount, "unpaid_count": -count}
+        for worker_id, (amount, count) in paid.items()
+    ])
+
+
+def record_work_logs_deleted(db: Session, work_logs: list):
+    """Отменяет учет удаляемых записей о работе"""
+    totals = defaultdict(lambda: [0.0, 0.0, 0])
+    for log in work_logs:
+        totals[log.worker_id][0] += log.payment
+        if not log.is_paid:
+            totals[log.worker_id][1] += log.payment
+            totals[log.worker_id][2] += 1
+    increment_many(db, WorkerBalance, ["worker_id"], [
+        {"worker_id": worker_id, "total_earned": -earned, "unpaid_amount": -unpaid, "unpaid_count": -count}
+        for worker_id, (earned, unpaid, count) in totals.items()
+    ])
+
+
+def record_salary_payment(db: Session, payment: SalaryPayment):
+    if payment.payment_type == PaymentType.ADVANCE:
+        increment(db, WorkerBalance, {"worker_id": payment.worker_id}, total_advances=payment.amount)
+    else:
+        increment(db, WorkerBalance, {"worker_id": payment.worker_id}, total_paid=payment.amount)
+
+
+def record_salary_payments(db: Session, payments: list):
+    """Как record_salary_payment, но для нескольких выплат одним запросом"""
+    totals = defaultdict(lambda: [0.0, 0.0])
+    for payment in payments:
+        totals[payment.worker_id][payment.payment_type == PaymentType.ADVANCE] += payment.amount
+    increment_many(db, WorkerBalance, ["worker_id"], [
+        {"worker_id": worker_id, "total_paid": paid, "total_advances": advances}
+        for worker_id, (paid, advances) in totals.items()
+    ])
+
+
+def get_balances(db: Session, worker_ids) -> dict:
+    """Балансы сотрудников одним запросом: {worker_id: WorkerBalance}"""
+    rows = db.query(WorkerBalance).filter(WorkerBalance.worker_id.in_(list(worker_ids))).all()
+    return {row.worker_id: row for row in rows}
+
+
+def expected_balances():
+    """select с балансами, посчитанными по work_logs и salary_payments"""
+    unpaid = case((WorkLog.is_paid == True, 0), else_=WorkLog.payment)
+    logs = select(
+        WorkLog.worker_id.label("worker_id"),
+        func.sum(WorkLog.payment).label("earned"),
+        func.sum(unpaid).label("unpaid_amount"),
+        func.sum(case((WorkLog.is_paid == True, 0), else_=1)).label("unpaid_count")
+    ).group_by(WorkLog.worker_id).subquery()
+    payments = select(
+        SalaryPayment.worker_id.label("worker_id"),
+        func.sum(case((SalaryPayment.payment_type == PaymentType.ADVANCE, 0), else_=SalaryPayment.amount)).label("paid"),
+        func.sum(case((SalaryPayment.payment_type == PaymentType.ADVANCE, SalaryPayment.amount), else_=0)).label("advances")
+    ).group_by(SalaryPayment.worker_id).subquery()
+
+    return select(
+        User.id.label("worker_id"),
+        func.coalesce(logs.c.earned, 0).label("total_earned"),
+        func.coalesce(payments.c.paid, 0).label("total_paid"),
+        func.coalesce(payments.c.advances, 0).label("total_advances"),
+        func.coalesce(logs.c.unpaid_amount, 0).label("unpaid_amount"),
+        func.coalesce(logs.c.unpaid_count, 0).label("unpaid_count")
+    ).outerjoin(
+        logs, logs.c.worker_id == User.id
+    ).outerjoin(
+        payments, payments.c.worker_id == User.id
+    ).where(or_(logs.c.worker_id.isnot(None), payments.c.worker_id.isnot(None)))
+
+
+def verify(db: Session, tolerance: float = 0.01) -> list:
+    """Список расхождений между worker_balances и исходными таблицами"""
+    stored = {row.worker_id: row for row in db.query(WorkerBalance).all()}
+    mismatches = []
+    for expected in db.execute(expected_balances()).mappings():
+        row = stored.pop(expected["worker_id"], None)
+        for field in BALANCE_FIELDS:
+            actual = getattr(row, field) if row else 0
+            if abs(actual - expected[field]) > tolerance:
+                mismatches.append({
+                    "worker_id": expected["worker_id"],
+                    "field": field,
+                    "stored": actual,
+                    "expected": expected[field]
+                })
+    # Строки без исходных данных должны быть нулевыми
+    for worker_id, row in stored.items():
+        for field in BALANCE_FIELDS:
+            if abs(getattr(row, field)) > tolerance:
+                mismatches.append({"worker_id": worker_id, "field": field, "stored": getattr(row, field), "expected": 0})
+    return mismatches
+
+
+def rebuild(db: Session):
+    """Пересчитывает worker_balances по исходным таблицам"""
+    db.execute(delete(WorkerBalance))
+    db.execute(insert(WorkerBalance).from_select(["worker_id"] + BALANCE_FIELDS, expected_balances()))
+
+
+def ensure_balances(engine):
+    """
+    Заполняет worker_balances по исходным таблицам, если она пуста (только что
+    создана на существующей базе) - иначе балансы и выплаты считались бы от нуля
+    """
+    with Session(bind=engine) as db:
+        if db.query(WorkerBalance.worker_id).first() is None:
+            rebuild(db)
+            db.commit()
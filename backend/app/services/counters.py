@@ -0,0 +1,25 @@
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+
+def increment(db: Session, model, key: dict, **deltas):
+    """Атомарно прибавляет deltas к строке model с ключом key (INSERT ... ON CONFLICT DO UPDATE)"""
+    stmt = insert(model).values(**key, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={name: getattr(model, name) + stmt.excluded[name] for name in deltas}
+    )
+    db.execute(stmt)
+
+
+def increment_many(db: Session, model, key_fields: list, rows: list):
+    """Как increment(), но для нескольких строк одним INSERT ... ON CONFLICT DO UPDATE"""
+    if not rows:
+        return
+    deltas = [name for name in rows[0] if name not in key_fields]
+    stmt = insert(model).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_fields,
+        set_={name: getattr(model, name) + stmt.excluded[name] for name in deltas}
+    )
+    db.execute(stmt)
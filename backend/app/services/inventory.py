@@ -0,0 +1,84 @@
+"""
+Перемещения по складу незавершенного производства (production_inventory).
+
+Каждое перемещение - один SQL-запрос: пополнение через
+INSERT ... ON CONFLICT DO UPDATE по ключу (product_id, stage_id), списание
+через UPDATE ... WHERE quantity >= :q. Поэтому одновременные запросы
+сотрудников не теряют обновления и не уводят остаток в минус.
+"""
+from sqlalchemy import func, text, update
+from sqlalchemy.orm import Session
+
+from app.models.production_inventory import ProductionInventory
+from app.services.counters import increment, increment_many
+
+UNIQUE_KEY_INDEX = "ux_production_inventory_product_stage"
+
+
+def add(db: Session, product_id: int, stage_id: int, quantity: int):
+    """Атомарно добавляет quantity на этап stage_id (создает строку при необходимости)"""
+    increment(db, ProductionInventory, {"product_id": product_id, "stage_id": stage_id}, quantity=quantity)
+
+
+def add_many(db: Session, stage_id: int, quantities: dict):
+    """Добавляет {product_id: quantity} на этап stage_id одним запросом"""
+    increment_many(db, ProductionInventory, ["product_id", "stage_id"], [
+        {"product_id": product_id, "stage_id": stage_id, "quantity": quantity}
+        for product_id, quantity in quantities.items()
+    ])
+
+
+def remove(db: Session, product_id: int, stage_id: int, quantity: int) -> bool:
+    """
+    Атомарно списывает quantity с этапа stage_id.
+    Возвращает False (ничего не меняя), если на этапе меньше quantity.
+    """
+    result = db.execute(
+        update(ProductionInventory).where(
+            ProductionInventory.product_id == product_id,
+            ProductionInventory.stage_id == stage_id,
+            ProductionInventory.quantity >= quantity
+        ).values(quantity=ProductionInventory.quantity - quantity)
+    )
+    return result.rowcount == 1
+
+
+def available(db: Session, product_id: int, stage_id: int) -> int:
+    """Текущий остаток на этапе (для сообщений об ошибке)"""
+    return db.query(func.coalesce(func.sum(ProductionInventory.quantity), 0)).filter(
+        ProductionInventory.product_id == product_id,
+        ProductionInventory.stage_id == stage_id
+    ).scalar()
+
+
+def ensure_unique_key(engine):
+    """
+    Добавляет уникальный индекс (product_id, stage_id) в базы, созданные до его
+    появления: дубликаты строк объединяются в строку с наименьшим id.
+    """
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"),
+            {"name": UNIQUE_KEY_INDEX}
+        ).first()
+        if exists:
+            return
+        conn.execute(text("""
+            UPDATE production_inventory SET quantity = (
+                SELECT SUM(d.quantity) FROM production_inventory d
+                WHERE d.product_id = production_inventory.product_id
+                  AND d.stage_id = production_inventory.stage_id
+            )
+            WHERE id IN (
+                SELECT MIN(id) FROM production_inventory
+                GROUP BY product_id, stage_id HAVING COUNT(*) > 1
+            )
+        """))
+        conn.execute(text("""
+            DELETE FROM production_inventory WHERE id NOT IN (
+                SELECT MIN(id) FROM production_inventory GROUP BY product_id, stage_id
+            )
+        """))
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX {UNIQUE_KEY_INDEX} ON production_inventory (product_id, stage_id)"
+        ))
@@ -0,0 +1,51 @@
+"""
+Условия выборки заказов, общие для списка, выгрузки и поиска.
+"""
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import or_
+
+from app.models.user import User, UserRole
+from app.models.order import Order, OrderStatus
+
+
+def order_filters(
+    current_user: User,
+    status: Optional[OrderStatus],
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    deadline_from: Optional[datetime] = None,
+    deadline_to: Optional[datetime] = None,
+    customer: Optional[str] = None
+) -> list:
+    """Условия выборки заказов с учетом роли пользователя"""
+    filters = []
+    
+    # Фильтрация по роли пользователя
+    if current_user.role == UserRole.WORKER:
+        # Сотрудники видят только заказы в работе
+        filters.append(Order.status == OrderStatus.IN_PROGRESS)
+    elif current_user.role == UserRole.WHOLESALER:
+        # Оптовики видят только свои заказы
+        filters.append(Order.wholesaler_id == current_user.id)
+    
+    # Фильтрация по статусу
+    if status:
+        filters.append(Order.status == status)
+    
+    # Фильтрация по дате создания и сроку
+    if start_date:
+        filters.append(Order.created_at >= start_date)
+    if end_date:
+        filters.append(Order.created_at <= end_date)
+    if deadline_from:
+        filters.append(Order.deadline >= deadline_from)
+    if deadline_to:
+        filters.append(Order.deadline <= deadline_to)
+    
+    # Поиск по имени или телефону клиента
+    if customer:
+        pattern = f"%{customer}%"
+        filters.append(or_(Order.customer_name.ilike(pattern), Order.customer_phone.ilike(pattern)))
+    
+    return filters
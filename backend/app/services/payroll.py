@@ -0,0 +1,116 @@
+"""
+Выплата зарплаты по записям о работе.
+
+settle() суммирует невыплаченные записи по сотрудникам одним запросом,
+сверяет суммы с worker_balances, помечает записи выплаченными одним
+UPDATE ... RETURNING и создает выплаты с учетом авансов (сумма считается
+по возвращенным строкам). Число запросов не зависит от количества записей
+и сотрудников. Коммит остается за вызывающей стороной.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+
+from app.models.work_log import WorkLog
+from app.models.salary_payment import SalaryPayment, PaymentType
+from app.services import rollups, balances
+
+BALANCE_TOLERANCE = 0.01
+
+
+def _refuse(db: Session, detail: str):
+    db.rollback()
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+
+def _default_comment(count: int) -> str:
+    return f"Выплата за {count} этапов (с учетом авансов)"
+
+
+def settle(
+    db: Session,
+    *conditions,
+    comment: Callable[[int], str] = _default_comment,
+    period_end: Optional[datetime] = None
+) -> dict:
+    """
+    Помечает выплаченными невыплаченные записи, удовлетворяющие conditions, и создает
+    по выплате на сотрудника, если с учетом авансов ему есть что выплатить;
+    comment(count) дает комментарий по числу записей. Если задан period_end,
+    невыплаченный заработок с period_end и позже не входит в баланс, из которого
+    вычитаются авансы (иначе работа после периода покрывала бы авансы).
+    Возвращает {worker_id: {"logs_count", "logs_amount", "balance", "payment"}},
+    payment - None, если выплата не создана.
+    """
+    unpaid = or_(WorkLog.is_paid == False, WorkLog.is_paid.is_(None))
+    pending = {
+        worker_id: (count, amount)
+        for worker_id, count, amount in db.query(
+            WorkLog.worker_id, func.count(WorkLog.id), func.sum(WorkLog.payment)
+        ).filter(*conditions, unpaid).group_by(WorkLog.worker_id)
+    }
+    if not pending:
+        return {}
+
+    # Балансы ДО этой выплаты, одним запросом
+    # Баланс = Заработано_всего - Выплачено_всего (зарплата + авансы)
+    worker_balances = balances.get_balances(db, pending.keys())
+    for worker_id, (count, amount) in pending.items():
+        balance = worker_balances.get(worker_id)
+        # Без строки баланса или с балансом, не покрывающим эти записи, выплата
+        # посчиталась бы неверно - отказываемся до сверки балансов
+        if balance is None or balance.unpaid_count < count or balance.unpaid_amount < amount - BALANCE_TOLERANCE:
+            _refuse(db, "Баланс сотрудника не сходится с записями о работе, выполните сверку балансов (verify_balances.py --fix)")
+
+    # Невыплаченный заработок после периода, одним запросом
+    later = dict(
+        db.query(WorkLog.worker_id, func.sum(WorkLog.payment)).filter(
+            unpaid,
+            WorkLog.completed_at >= period_end,
+            WorkLog.worker_id.in_(list(pending))
+        ).group_by(WorkLog.worker_id).all()
+    ) if period_end else {}
+
+    paid_logs = db.execute(
+        update(WorkLog).where(*conditions, unpaid).values(is_paid=True).returning(
+            WorkLog.worker_id, WorkLog.product_id, WorkLog.completed_at, WorkLog.payment
+        ).execution_options(synchronize_session=False)
+    ).all()
+
+    # Сумма выплаты - по фактически помеченным записям
+    settled = defaultdict(lambda: {"logs_count": 0, "logs_amount": 0.0, "balance": 0.0, "payment": None})
+    for log in paid_logs:
+        settled[log.worker_id]["logs_count"] += 1
+        settled[log.worker_id]["logs_amount"] += log.payment
+    if {worker_id: totals["logs_count"] for worker_id, totals in settled.items()} != {
+        worker_id: count for worker_id, (count, _) in pending.items()
+    }:
+        _refuse(db, "Записи о работе изменились во время расчета, повторите запрос")
+    rollups.record_work_logs_paid(db, paid_logs)
+    balances.record_work_logs_paid(db, paid_logs)
+
+    # Если баланс 80к, а логи на 100к, значит 20к уже было выдано авансом:
+    # выплачиваем только то, что реально должны (не более суммы логов и не меньше 0)
+    now = datetime.utcnow()
+    payments = []
+    for worker_id, totals in settled.items():
+        totals["balance"] = worker_balances[worker_id].current_balance - later.get(worker_id, 0)
+        actual_payout = max(0, min(totals["logs_amount"], totals["balance"]))
+        if actual_payout > 0:
+            totals["payment"] = SalaryPayment(
+                worker_id=worker_id,
+                amount=actual_payout,
+                payment_type=PaymentType.SALARY,
+                comment=comment(totals["logs_count"]),
+                created_at=now
+            )
+            payments.append(totals["payment"])
+
+    db.add_all(payments)
+    db.flush()
+    rollups.record_salary_payments(db, payments)
+    balances.record_salary_payments(db, payments)
+    return dict(settled)
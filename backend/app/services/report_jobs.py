@@ -0,0 +1,104 @@
+"""
+Фоновое выполнение тяжелых отчетов.
+
+Задания выполняются в пуле потоков с ограниченным числом одновременных
+расчетов, каждое в своей сессии БД. Состояние задания и результат
+сохраняются на диск (REPORT_JOBS_DIR/<id>.json и <id>.result.json), поэтому
+статус и результат доступны и после перезапуска сервера.
+"""
+import json
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional
+
+from app.core.database import SessionLocal
+from app.schemas.report_job import ReportJobStatus
+
+REPORT_JOBS_DIR = "./report_jobs"
+MAX_CONCURRENT_REPORT_JOBS = 2
+
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REPORT_JOBS, thread_name_prefix="report-job")
+_active = set()
+_lock = threading.Lock()
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _meta_path(job_id: str) -> str:
+    return os.path.join(REPORT_JOBS_DIR, f"{job_id}.json")
+
+
+def result_path(job_id: str) -> str:
+    return os.path.join(REPORT_JOBS_DIR, f"{job_id}.result.json")
+
+
+def _write_json(path: str, data: dict):
+    # Пишем во временный файл и переименовываем, чтобы не отдать наполовину записанный файл
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+def _update(job: dict, **fields) -> dict:
+    job.update(fields)
+    _write_json(_meta_path(job["id"]), job)
+    return job
+
+
+def _run(job: dict, compute: Callable):
+    _update(job, status=ReportJobStatus.RUNNING.value, started_at=datetime.utcnow().isoformat())
+    db = SessionLocal()
+    try:
+        result = compute(db)
+        _write_json(result_path(job["id"]), result)
+        _update(job, status=ReportJobStatus.DONE.value, finished_at=datetime.utcnow().isoformat())
+    except Exception as e:
+        print(f"Report job {job['id']} failed: {e}")
+        _update(job, status=ReportJobStatus.FAILED.value, finished_at=datetime.utcnow().isoformat(), error=str(e))
+    finally:
+        db.close()
+        with _lock:
+            _active.discard(job["id"])
+
+
+def submit(report: str, params: dict, created_by: int, compute: Callable) -> dict:
+    """Ставит расчет compute(db) в очередь и возвращает описание задания"""
+    os.makedirs(REPORT_JOBS_DIR, exist_ok=True)
+    job = {
+        "id": uuid.uuid4().hex,
+        "report": report,
+        "status": ReportJobStatus.QUEUED.value,
+        "created_by": created_by,
+        "created_at": datetime.utcnow().isoformat(),
+        **params
+    }
+    _update(job)
+    snapshot = dict(job)
+    with _lock:
+        _active.add(job["id"])
+    _executor.submit(_run, job, compute)
+    return snapshot
+
+
+def get(job_id: str) -> Optional[dict]:
+    """Описание задания или None, если задание не найдено"""
+    if not _JOB_ID.match(job_id) or not os.path.exists(_meta_path(job_id)):
+        return None
+    with open(_meta_path(job_id), encoding="utf-8") as f:
+        job = json.load(f)
+
+    # Задание не завершилось, но и не выполняется - сервер был перезапущен
+    unfinished = (ReportJobStatus.QUEUED.value, ReportJobStatus.RUNNING.value)
+    with _lock:
+        interrupted = job["status"] in unfinished and job_id not in _active
+    if interrupted:
+        # Повторно читаем с диска: задание могло завершиться, пока мы проверяли
+        with open(_meta_path(job_id), encoding="utf-8") as f:
+            job = json.load(f)
+        if job["status"] in unfinished:
+            _update(job, status=ReportJobStatus.FAILED.value, error="Прервано перезапуском сервера")
+    return job
@@ -0,0 +1,208 @@
+"""
+Инкрементальное обновление сводных таблиц по дням.
+
+Функции record_* вызываются роутерами в той же транзакции, что и запись
+исходных данных; коммит остается за вызывающей стороной. rebuild()
+пересчитывает сводные таблицы с нуля по исходным таблицам; ensure_rollups()
+делает это при запуске, если сводные таблицы только что созданы.
+"""
+from datetime import datetime
+from collections import defaultdict
+from sqlalchemy import func, select, delete, case
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.models.order import Order, OrderStatus
+from app.models.expense import Expense
+from app.models.work_log import WorkLog
+from app.models.salary_payment import SalaryPayment
+from app.models.rollup import DailySales, DailyExpense, DailyWorkerOutput, DailySalaryPayment, OrderStageProgress
+from app.services.counters import increment, increment_many
+from app.services.sales import sales_lines
+
+ROLLUP_MODELS = [DailySales, DailyExpense, DailyWorkerOutput, DailySalaryPayment, OrderStageProgress]
+
+
+def _day(value: datetime):
+    return (value or datetime.utcnow()).date()
+
+
+def record_sale(db: Session, order: Order, sign: int = 1):
+    """Учитывает доставленный заказ по его позициям (sign=-1 - отменяет учет)"""
+    lines = sales_lines(Order.id == order.id).subquery()
+    rows = db.execute(
+        select(
+            lines.c.product_id,
+            lines.c.wholesaler_id,
+            func.sum(lines.c.quantity),
+            func.sum(lines.c.revenue),
+            func.sum(lines.c.cost)
+        ).group_by(lines.c.product_id, lines.c.wholesaler_id)
+    ).all()
+    for product_id, wholesaler_id, quantity, revenue, cost in rows:
+        increment(
+            db, DailySales,
+            {"day": _day(order.delivered_at), "product_id": product_id, "wholesaler_id": wholesaler_id},
+            orders_count=sign, quantity=sign * quantity, revenue=sign * revenue, cost=sign * cost
+        )
+
+
+def record_expense(db: Session, expense: Expense, sign: int = 1):
+    increment(
+        db, DailyExpense,
+        {"day": _day(expense.created_at), "expense_type": expense.expense_type},
+        expenses_count=sign, amount=sign * expense.amount
+    )
+
+
+def record_work_log(db: Session, work_log: WorkLog):
+    increment(
+        db, DailyWorkerOutput,
+        {"day": _day(work_log.completed_at), "worker_id": work_log.worker_id, "product_id": work_log.product_id},
+        logs_count=1,
+        quantity=work_log.quantity,
+        earned=work_log.payment,
+        paid=work_log.payment if work_log.is_paid else 0
+    )
+    if work_log.order_id:
+        increment(
+            db, OrderStageProgress,
+            {"order_id": work_log.order_id, "stage_id": work_log.stage_id},
+            completed_quantity=work_log.quantity
+        )
+
+
+def completed_quantity(db: Session, order_id: int, stage_id: int) -> int:
+    """Сколько изделий заказа прошло этап stage_id (одно чтение строки счетчика)"""
+    return db.scalar(
+        select(OrderStageProgress.completed_quantity).where(
+            OrderStageProgress.order_id == order_id,
+            OrderStageProgress.stage_id == stage_id
+        )
+    ) or 0
+
+
+def record_work_logs_paid(db: Session, work_logs: list):
+    """Учитывает перевод записей о работе в статус "выплачено" """
+    paid = defaultdict(float)
+    for log in work_logs:
+        paid[(_day(log.completed_at), log.worker_id, log.product_id)] += log.payment
+    increment_many(db, DailyWorkerOutput, ["day", "worker_id", "product_id"], [
+        {"day": day, "worker_id": worker_id, "product_id": product_id, "paid": amount}
+        for (day, worker_id, product_id), amount in paid.items()
+    ])
+
+
+def record_work_logs_deleted(db: Session, work_logs: list):
+    """Отменяет учет удаляемых записей о работе (счетчик OrderStageProgress удаляется отдельно)"""
+    totals = defaultdict(lambda: [0, 0, 0.0, 0.0])
+    for log in work_logs:
+        row = totals[(_day(log.completed_at), log.worker_id, log.product_id)]
+        row[0] += 1
+        row[1] += log.quantity
+        row[2] += log.payment
+        row[3] += log.payment if log.is_paid else 0
+    increment_many(db, DailyWorkerOutput, ["day", "worker_id", "product_id"], [
+        {
+            "day": day, "worker_id": worker_id, "product_id": product_id,
+            "logs_count": -count, "quantity": -quantity, "earned": -earned, "paid": -paid
+        }
+        for (day, worker_id, product_id), (count, quantity, earned, paid) in totals.items()
+    ])
+
+
+def record_salary_payment(db: Session, payment: SalaryPayment):
+    increment(
+        db, DailySalaryPayment,
+        {"day": _day(payment.created_at), "worker_id": payment.worker_id, "payment_type": payment.payment_type},
+        payments_count=1, amount=payment.amount
+    )
+
+
+def record_salary_payments(db: Session, payments: list):
+    """Как record_salary_payment, но для нескольких выплат одним запросом"""
+    totals = defaultdict(lambda: [0, 0.0])
+    for payment in payments:
+        key = (_day(payment.created_at), payment.worker_id, payment.payment_type)
+        totals[key][0] += 1
+        totals[key][1] += payment.amount
+    increment_many(db, DailySalaryPayment, ["day", "worker_id", "payment_type"], [
+        {"day": day, "worker_id": worker_id, "payment_type": payment_type, "payments_count": count, "amount": amount}
+        for (day, worker_id, payment_type), (count, amount) in totals.items()
+    ])
+
+
+def rebuild(db: Session):
+    """Полностью пересчитывает сводные таблицы по исходным данным"""
+    for model in ROLLUP_MODELS:
+        db.execute(delete(model))
+
+    lines = sales_lines(
+        Order.status == OrderStatus.DELIVERED,
+        Order.delivered_at.isnot(None)
+    ).subquery()
+    db.execute(insert(DailySales).from_select(
+        ["day", "product_id", "wholesaler_id", "orders_count", "quantity", "revenue", "cost"],
+        select(
+            lines.c.day,
+            lines.c.product_id,
+            lines.c.wholesaler_id,
+            func.count(func.distinct(lines.c.order_id)),
+            func.sum(lines.c.quantity),
+            func.sum(lines.c.revenue),
+            func.sum(lines.c.cost)
+        ).group_by(lines.c.day, lines.c.product_id, lines.c.wholesaler_id)
+    ))
+
+    expense_day = func.date(Expense.created_at)
+    db.execute(insert(DailyExpense).from_select(
+        ["day", "expense_type", "expenses_count", "amount"],
+        select(
+            expense_day, Expense.expense_type, func.count(Expense.id), func.sum(Expense.amount)
+        ).group_by(expense_day, Expense.expense_type)
+    ))
+
+    log_day = func.date(WorkLog.completed_at)
+    db.execute(insert(DailyWorkerOutput).from_select(
+        ["day", "worker_id", "product_id", "logs_count", "quantity", "earned", "paid"],
+        select(
+            log_day,
+            WorkLog.worker_id,
+            WorkLog.product_id,
+            func.count(WorkLog.id),
+            func.sum(WorkLog.quantity),
+            func.sum(WorkLog.payment),
+            func.sum(case((WorkLog.is_paid == True, WorkLog.payment), else_=0))
+        ).group_by(log_day, WorkLog.worker_id, WorkLog.product_id)
+    ))
+
+    payment_day = func.date(SalaryPayment.created_at)
+    db.execute(insert(DailySalaryPayment).from_select(
+        ["day", "worker_id", "payment_type", "payments_count", "amount"],
+        select(
+            payment_day,
+            SalaryPayment.worker_id,
+            SalaryPayment.payment_type,
+            func.count(SalaryPayment.id),
+            func.sum(SalaryPayment.amount)
+        ).group_by(payment_day, SalaryPayment.worker_id, SalaryPayment.payment_type)
+    ))
+
+    db.execute(insert(OrderStageProgress).from_select(
+        ["order_id", "stage_id", "completed_quantity"],
+        select(
+            WorkLog.order_id, WorkLog.stage_id, func.sum(WorkLog.quantity)
+        ).where(WorkLog.order_id.isnot(None)).group_by(WorkLog.order_id, WorkLog.stage_id)
+    ))
+
+
+def ensure_rollups(engine, existing_tables: set):
+    """
+    Пересобирает сводные таблицы, если какой-то из них нет в existing_tables
+    (список таблиц до create_all) - иначе на существующей базе отчеты были бы пустыми
+    """
+    if all(model.__tablename__ in existing_tables for model in ROLLUP_MODELS):
+        return
+    with Session(bind=engine) as db:
+        rebuild(db)
+        db.commit()
@@ -0,0 +1,76 @@
+"""
+Строки продаж по позициям заказов.
+
+Каждый OrderItem дает строку с количеством, выручкой и себестоимостью по
+цене и себестоимости, зафиксированным в позиции при создании заказа, -
+поэтому учет продажи, его отмена и пересборка сводок дают одни и те же
+суммы. Если у заказа задана итоговая цена (total_price), она распределяется
+по позициям пропорционально их стоимости по price_at_order.
+ensure_order_item_prices() при запуске дополняет позиции старых баз.
+"""
+from sqlalchemy import Float, and_, case, cast, func, inspect, select, text
+
+from app.models.order import Order, OrderItem
+
+
+def sales_lines(*conditions):
+    """
+    select со строками продаж заказов, удовлетворяющих conditions (условия на Order).
+    Колонки: order_id, day, product_id, wholesaler_id, quantity, revenue, cost.
+    """
+    lines = select(
+        OrderItem.order_id.label("order_id"),
+        OrderItem.product_id.label("product_id"),
+        OrderItem.quantity.label("quantity"),
+        OrderItem.price_at_order.label("price"),
+        OrderItem.cost_at_order.label("unit_cost")
+    ).join(Order, Order.id == OrderItem.order_id).where(*conditions).subquery()
+
+    subtotal = lines.c.quantity * lines.c.price
+    order_subtotal = func.sum(subtotal).over(partition_by=lines.c.order_id)
+    order_quantity = func.sum(lines.c.quantity).over(partition_by=lines.c.order_id)
+    total_price = func.nullif(Order.total_price, 0)
+    # Деление дает NUMERIC (Decimal в результатах) - приводим выручку к Float, как остальные суммы
+    revenue = cast(case(
+        (and_(total_price.isnot(None), order_subtotal > 0), total_price * subtotal / order_subtotal),
+        (total_price.isnot(None), total_price * lines.c.quantity / order_quantity),
+        else_=subtotal
+    ), Float)
+
+    return select(
+        lines.c.order_id,
+        func.date(Order.delivered_at).label("day"),
+        func.coalesce(lines.c.product_id, 0).label("product_id"),
+        func.coalesce(Order.wholesaler_id, 0).label("wholesaler_id"),
+        func.coalesce(lines.c.quantity, 0).label("quantity"),
+        func.coalesce(revenue, 0).label("revenue"),
+        func.coalesce(lines.c.quantity * lines.c.unit_cost, 0).label("cost")
+    ).select_from(lines).join(
+        Order, Order.id == lines.c.order_id
+    )
+
+
+def ensure_order_item_prices(engine):
+    """
+    Дополняет базы, созданные до фиксации себестоимости в позициях: добавляет
+    колонку cost_at_order, создает позиции для старых заказов без позиций
+    (из заголовка заказа) и заполняет пустые цену и себестоимость текущими
+    значениями товара.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns(OrderItem.__tablename__)}
+    with engine.begin() as conn:
+        if "cost_at_order" not in columns:
+            conn.execute(text("ALTER TABLE order_items ADD COLUMN cost_at_order FLOAT"))
+        conn.execute(text("""
+            INSERT INTO order_items (order_id, product_id, quantity, price_at_order, cost_at_order)
+            SELECT o.id, o.product_id, o.quantity, p.price, p.cost
+            FROM orders o JOIN products p ON p.id = o.product_id
+            WHERE o.quantity IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM order_items i WHERE i.order_id = o.id)
+        """))
+        conn.execute(text("""
+            UPDATE order_items SET
+                price_at_order = coalesce(price_at_order, (SELECT price FROM products WHERE id = order_items.product_id)),
+                cost_at_order = coalesce(cost_at_order, (SELECT cost FROM products WHERE id = order_items.product_id))
+            WHERE price_at_order IS NULL OR cost_at_order IS NULL
+        """))
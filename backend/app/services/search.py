@@ -0,0 +1,78 @@
+"""
+Полнотекстовый поиск (SQLite FTS5) по заказам, товарам и пользователям.
+
+Для каждой исходной таблицы заводится FTS5-таблица с rowid = id исходной
+строки; триггеры на INSERT / UPDATE / DELETE держат ее в синхронизации.
+Телефоны дополнительно индексируются без пробелов и знаков, чтобы
+"+7 (999) 123" находился по "7999123".
+ensure_search_index() создает недостающие таблицы и триггеры и заполняет
+индекс по уже существующим данным.
+"""
+import re
+from sqlalchemy import text
+
+_DIGITS = "replace(replace(replace(replace(replace(coalesce({0}, ''), ' ', ''), '-', ''), '(', ''), ')', ''), '+', '')"
+
+# FTS-таблица -> (исходная таблица, индексируемые колонки {колонка FTS: выражение SQL над строкой})
+SEARCH_TABLES = {
+    "orders_fts": ("orders", {
+        "customer_name": "{row}.customer_name",
+        "customer_phone": "{row}.customer_phone",
+        "customer_address": "{row}.customer_address",
+        "phone_digits": _DIGITS.format("{row}.customer_phone")
+    }),
+    "products_fts": ("products", {
+        "name": "{row}.name",
+        "description": "{row}.description"
+    }),
+    "users_fts": ("users", {
+        "full_name": "{row}.full_name",
+        "username": "{row}.username",
+        "phone": "{row}.phone",
+        "phone_digits": _DIGITS.format("{row}.phone")
+    })
+}
+
+
+def _source_columns(columns: dict) -> list:
+    """Колонки исходной таблицы, от которых зависит индекс"""
+    return sorted({name for expr in columns.values() for name in re.findall(r"\{row\}\.(\w+)", expr)})
+
+
+def _ddl(fts_table: str, source: str, columns: dict) -> list:
+    names = ", ".join(columns)
+
+    def values(row: str) -> str:
+        return ", ".join(expr.format(row=row) for expr in columns.values())
+
+    insert = f"INSERT INTO {fts_table}(rowid, {names}) VALUES (new.id, {values('new')});"
+    delete = f"DELETE FROM {fts_table} WHERE rowid = old.id;"
+    return [
+        f"CREATE VIRTUAL TABLE {fts_table} USING fts5({names}, tokenize = 'unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {source} BEGIN {insert} END",
+        f"CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {source} BEGIN {delete} END",
+        f"CREATE TRIGGER {fts_table}_au AFTER UPDATE OF {', '.join(_source_columns(columns))} ON {source} "
+        f"BEGIN {delete} {insert} END",
+        f"INSERT INTO {fts_table}(rowid, {names}) SELECT id, {values(source)} FROM {source}"
+    ]
+
+
+def ensure_search_index(engine):
+    """Создает FTS-таблицы и триггеры, которых еще нет, и индексирует существующие строки"""
+    with engine.begin() as conn:
+        existing = {
+            row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+        }
+        for fts_table, (source, columns) in SEARCH_TABLES.items():
+            if fts_table in existing:
+                continue
+            for statement in _ddl(fts_table, source, columns):
+                conn.execute(text(statement))
+
+
+def match_query(q: str) -> str:
+    """
+    Строка запроса FTS5 из пользовательского ввода: каждое слово ищется по
+    префиксу, все слова должны встретиться. Пустая строка, если слов нет.
+    """
+    return " ".join(f'"{token}"*' for token in re.findall(r"\w+", q))
@@ -0,0 +1,118 @@
+"""
+Кэш порядка этапов производства по товарам.
+
+Для каждого товара хранится упорядоченный список этапов с указателями на
+предыдущий / следующий этап, поэтому маршрутизация задач сводится к
+поиску в словаре. Кэш хранит простые значения (не ORM-объекты) и
+сбрасывается через invalidate() при создании, изменении и удалении товара.
+
+Как и кэш отчетов (app/core/cache.py), запись действительна, пока не
+изменилась версия таблицы этапов и не истек TTL: изменения, сделанные
+другим процессом, видны не позже чем через STAGE_GRAPH_TTL_SECONDS.
+Версия таблицы products не учитывается - она меняется при каждом
+движении остатков на складе.
+"""
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.cache import table_versions
+from app.models.product import Product
+from app.models.production_stage import ProductionStage
+
+STAGE_GRAPH_TTL_SECONDS = 60
+STAGE_GRAPH_TABLES = (ProductionStage.__tablename__,)
+
+WAREHOUSE_STAGE_ID = 0
+WAREHOUSE_STAGE_NAME = "Склад заготовок"
+
+
+class StageNode:
+    __slots__ = ("id", "name", "order_num", "payment", "prev_id", "next_id")
+
+    def __init__(self, id: int, name: str, order_num: int, payment: float):
+        self.id = id
+        self.name = name
+        self.order_num = order_num
+        self.payment = payment
+        self.prev_id = WAREHOUSE_STAGE_ID  # Перед первым этапом - склад заготовок
+        self.next_id = None  # После последнего этапа - склад готовой продукции
+
+
+class StageGraph:
+    def __init__(self, product: Product):
+        self.product_id = product.id
+        self.product_name = product.name
+        self.stages = [
+            StageNode(s.id, s.name, s.order_num, s.payment)
+            for s in sorted(product.stages, key=lambda x: x.order_num)
+        ]
+        for prev, curr in zip(self.stages, self.stages[1:]):
+            curr.prev_id = prev.id
+            prev.next_id = curr.id
+        self.by_id = {s.id: s for s in self.stages}
+
+    @property
+    def first(self) -> Optional[StageNode]:
+        return self.stages[0] if self.stages else None
+
+    @property
+    def last(self) -> Optional[StageNode]:
+        return self.stages[-1] if self.stages else None
+
+    def get(self, stage_id: int) -> Optional[StageNode]:
+        return self.by_id.get(stage_id)
+
+    def next_stage(self, stage_id: int) -> Optional[StageNode]:
+        """Этап, на который переходят изделия из stage_id (0 - склад заготовок)"""
+        if stage_id == WAREHOUSE_STAGE_ID:
+            return self.first
+        node = self.by_id.get(stage_id)
+        if node is None or node.next_id is None:
+            return None
+        return self.by_id[node.next_id]
+
+    def stage_name(self, stage_id: int) -> Optional[str]:
+        if stage_id == WAREHOUSE_STAGE_ID:
+            return WAREHOUSE_STAGE_NAME
+        node = self.by_id.get(stage_id)
+        return node.name if node else None
+
+
+_graphs: Dict[int, tuple] = {}  # product_id -> (версии таблиц, срок действия, StageGraph)
+_lock = threading.Lock()
+
+
+def get_graphs(db: Session, product_ids: Iterable[int]) -> Dict[int, StageGraph]:
+    """Графы этапов для товаров; недостающие и устаревшие загружаются одним запросом"""
+    product_ids = set(product_ids)
+    # Версии снимаются до загрузки, чтобы изменение во время загрузки не закрепилось в кэше
+    versions = table_versions(STAGE_GRAPH_TABLES)
+    now = time.monotonic()
+    with _lock:
+        entries = {pid: _graphs.get(pid) for pid in product_ids}
+    result = {
+        pid: entry[2] for pid, entry in entries.items()
+        if entry is not None and entry[0] == versions and entry[1] > now
+    }
+    missing = product_ids - result.keys()
+    if missing:
+        products = db.query(Product).options(
+            selectinload(Product.stages)
+        ).filter(Product.id.in_(list(missing))).all()
+        loaded = {product.id: StageGraph(product) for product in products}
+        expires_at = now + STAGE_GRAPH_TTL_SECONDS
+        with _lock:
+            _graphs.update({pid: (versions, expires_at, graph) for pid, graph in loaded.items()})
+        result.update(loaded)
+    return result
+
+
+def invalidate(product_id: Optional[int] = None):
+    """Сбрасывает граф товара (или весь кэш, если product_id не указан)"""
+    with _lock:
+        if product_id is None:
+            _graphs.clear()
+        else:
+            _graphs.pop(product_id, None)
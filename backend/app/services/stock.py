@@ -0,0 +1,41 @@
+"""
+Движение готовой продукции на складе (products.stock).
+
+Списание - условный UPDATE ... WHERE stock >= :q, поэтому одновременные
+сдачи заказов не продают больше, чем есть на складе, и не требуют
+чтения остатка перед записью.
+"""
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+
+
+def remove(db: Session, product_id: int, quantity: int) -> bool:
+    """Атомарно списывает quantity; False, если на складе меньше quantity"""
+    result = db.execute(
+        update(Product).where(
+            Product.id == product_id,
+            Product.stock >= quantity
+        ).values(stock=Product.stock - quantity)
+    )
+    return result.rowcount == 1
+
+
+def remove_many(db: Session, quantities: dict) -> list:
+    """
+    Списывает {product_id: quantity}. Возвращает id товаров, по которым
+    остатка не хватило; в этом случае вызывающая сторона должна откатить транзакцию.
+    """
+    return [
+        product_id for product_id, quantity in sorted(quantities.items())
+        if not remove(db, product_id, quantity)
+    ]
+
+
+def add_many(db: Session, quantities: dict):
+    """Атомарно зачисляет на склад {product_id: quantity}"""
+    for product_id, quantity in sorted(quantities.items()):
+        db.execute(
+            update(Product).where(Product.id == product_id).values(stock=Product.stock + quantity)
+        )
@@ -0,0 +1,21 @@
+from app.core.database import SessionLocal, engine, Base
+from app.services import rollups
+
+# Пересоздает сводные таблицы и заполняет их по исходным данным.
+# Запускать после переноса данных или изменения схемы сводных таблиц.
+
+def rebuild_rollups():
+    tables = [model.__table__ for model in rollups.ROLLUP_MODELS]
+    Base.metadata.drop_all(bind=engine, tables=tables)
+    Base.metadata.create_all(bind=engine, tables=tables)
+
+    db = SessionLocal()
+    try:
+        rollups.rebuild(db)
+        db.commit()
+        print("Rollup tables rebuilt.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_rollups()
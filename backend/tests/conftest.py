@@ -0,0 +1,129 @@
+"""
+Общие фикстуры API-тестов.
+
+Приложение работает с базой SQLite в памяти: движок подменяется до импорта
+app.main, поэтому создание таблиц при запуске не трогает production_v3.db.
+Каждый тест получает чистую базу; аутентификация заменена выбором текущего
+пользователя через as_user().
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.core.database as database
+
+
+def _memory_engine():
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+database.engine = _memory_engine()
+database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=database.engine)
+
+from app.main import app  # noqa: E402
+from app.core.cache import report_cache  # noqa: E402
+from app.core.database import Base, get_db  # noqa: E402
+from app.core.security import get_current_active_user  # noqa: E402
+from app.models.user import User, UserRole  # noqa: E402
+from app.services import stage_graph  # noqa: E402
+
+
+@pytest.fixture
+def session_factory():
+    engine = _memory_engine()
+    Base.metadata.create_all(bind=engine)
+    stage_graph.invalidate()
+    report_cache.clear()
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def current_user():
+    return {}
+
+
+@pytest.fixture
+def client(session_factory, current_user):
+    def _get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def _current_user():
+        session = session_factory()
+        try:
+            user = session.get(User, current_user["id"])
+            session.expunge(user)
+            return user
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = _get_db
+    app.dependency_overrides[get_current_active_user] = _current_user
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def as_user(current_user):
+    def _as_user(user):
+        current_user["id"] = user.id
+    return _as_user
+
+
+def _create_user(db, username: str, role: UserRole) -> User:
+    user = User(
+        username=username,
+        email=f"{username}@example.com",
+        full_name=username.title(),
+        hashed_password="x",
+        role=role
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+@pytest.fixture
+def admin(db):
+    return _create_user(db, "admin", UserRole.ADMIN)
+
+
+@pytest.fixture
+def worker(db):
+    return _create_user(db, "worker", UserRole.WORKER)
+
+
+@pytest.fixture
+def product(client, admin, as_user):
+    """
+    Фабрика товаров: создает товар от имени администратора (текущим пользователем
+    остается администратор). produce - сколько заготовок сразу запустить в производство.
+    Этапы в ответе отсортированы по order_num.
+    """
+    def _product(stages=None, produce: int = 0, **fields) -> dict:
+        as_user(admin)
+        data = {
+            "name": "Стол", "price": 100, "cost": 40,
+            "stages": stages or [{"name": "Сборка", "order_num": 1, "payment": 10}],
+            **fields
+        }
+        created = client.post("/api/v1/products/", json=data).json()
+        created["stages"].sort(key=lambda stage: stage["order_num"])
+        if produce:
+            client.post(f"/api/v1/products/{created['id']}/produce", params={"quantity": produce})
+        return created
+    return _product
@@ -0,0 +1,74 @@
+from app.models.production_inventory import ProductionInventory
+from app.services import inventory
+
+API = "/api/v1"
+
+STAGES = [
+    {"name": "Раскрой", "order_num": 1, "payment": 10},
+    {"name": "Сборка", "order_num": 2, "payment": 20}
+]
+
+
+def test_update_product_keeps_stage_ids(client, product):
+    created = product(STAGES)
+
+    response = client.patch(f"{API}/products/{created['id']}", json={"stages": [
+        {"name": "Раскрой", "order_num": 1, "payment": 15},
+        {"name": "Сборка", "order_num": 2, "payment": 20},
+        {"name": "Покраска", "order_num": 3, "payment": 5}
+    ]})
+
+    assert response.status_code == 200
+    stages = sorted(response.json()["stages"], key=lambda stage: stage["order_num"])
+    assert [stage["id"] for stage in stages[:2]] == [stage["id"] for stage in created["stages"]]
+    assert stages[0]["payment"] == 15
+
+
+def test_remove_unused_stage(client, product):
+    created = product(STAGES)
+
+    response = client.patch(f"{API}/products/{created['id']}", json={"stages": STAGES[:1]})
+
+    assert response.status_code == 200
+    assert [stage["id"] for stage in response.json()["stages"]] == [created["stages"][0]["id"]]
+
+
+def test_remove_stage_with_work_logs_is_rejected(client, product, admin, worker, as_user):
+    created = product(STAGES, produce=2)
+    first, second = created["stages"]
+    as_user(worker)
+    assert client.post(f"{API}/work-logs/", json={
+        "product_id": created["id"], "stage_id": first["id"], "quantity": 2
+    }).status_code == 201
+    assert client.post(f"{API}/work-logs/", json={
+        "product_id": created["id"], "stage_id": second["id"], "quantity": 2
+    }).status_code == 201
+
+    as_user(admin)
+    response = client.patch(f"{API}/products/{created['id']}", json={"stages": STAGES[:1]})
+
+    assert response.status_code == 400
+    stages = client.get(f"{API}/products/{created['id']}").json()["stages"]
+    assert {stage["id"] for stage in stages} == {first["id"], second["id"]}
+
+
+def test_remove_stage_with_items_in_progress_is_rejected(client, db, product):
+    created = product(STAGES)
+    inventory.add(db, created["id"], created["stages"][1]["id"], 3)
+    db.commit()
+
+    response = client.patch(f"{API}/products/{created['id']}", json={"stages": STAGES[:1]})
+
+    assert response.status_code == 400
+
+
+def test_remove_stage_drops_its_empty_inventory(client, db, product):
+    created = product(STAGES)
+    removed_id = created["stages"][1]["id"]
+    inventory.add(db, created["id"], removed_id, 0)
+    db.commit()
+
+    response = client.patch(f"{API}/products/{created['id']}", json={"stages": STAGES[:1]})
+
+    assert response.status_code == 200
+    assert db.query(ProductionInventory).filter(ProductionInventory.stage_id == removed_id).count() == 0
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from app.services import rollups
+
+API = "/api/v1"
+
+
+def _rollup_rows(db) -> dict:
+    """Ненулевые строки сводных таблиц {(таблица, ключ): значения}"""
+    rows = {}
+    for model in rollups.ROLLUP_MODELS:
+        table = model.__table__
+        key_columns = [column.name for column in table.primary_key]
+        for row in db.execute(select(table)).mappings():
+            values = tuple(round(row[name], 6) for name in row.keys() if name not in key_columns)
+            if any(values):
+                rows[(table.name, tuple(row[name] for name in key_columns))] = values
+    return rows
+
+
+def _assert_rollups_match_rebuild(db):
+    incremental = _rollup_rows(db)
+    rollups.rebuild(db)
+    rebuilt = _rollup_rows(db)
+    db.rollback()
+    assert incremental == rebuilt
+
+
+def _delivered_order(client, product) -> int:
+    product_id = product()["id"]
+    client.patch(f"{API}/products/{product_id}", json={"stock": 5})
+    order_id = client.post(f"{API}/orders/", json={
+        "deadline": "2026-12-01T00:00:00",
+        "customer_name": "Иванов",
+        "items": [{"product_id": product_id, "quantity": 2}]
+    }).json()["id"]
+    for status in ("in_progress", "done", "delivered"):
+        assert client.patch(f"{API}/orders/{order_id}/status", json={"status": status}).status_code == 200
+    return order_id
+
+
+def test_cash_ledger_export_csv(client, product):
+    order_id = _delivered_order(client, product)
+
+    response = client.get(f"{API}/reports/cash/export", params={"format": "csv"})
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text.lstrip("\ufeff"))))
+    assert len(rows) == 1
+    assert rows[0]["kind"] == "sale"
+    assert rows[0]["reference_id"] == str(order_id)
+    assert rows[0]["amount"] == "200.0"
+
+
+def test_cash_ledger_export_ndjson(client, product):
+    order_id = _delivered_order(client, product)
+
+    response = client.get(f"{API}/reports/cash/export", params={"format": "ndjson"})
+
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 1
+    assert rows[0]["kind"] == "sale"
+    assert rows[0]["reference_id"] == order_id
+    assert rows[0]["amount"] == 200.0
+
+
+def test_sale_reversal_uses_cost_at_order(client, db, product):
+    order_id = _delivered_order(client, product)
+    product_id = client.get(f"{API}/orders/{order_id}").json()["items"][0]["product_id"]
+    client.patch(f"{API}/products/{product_id}", json={"cost": 70, "price": 150})
+    _assert_rollups_match_rebuild(db)
+
+    assert client.delete(f"{API}/orders/{order_id}").status_code == 204
+
+    _assert_rollups_match_rebuild(db)
+    cash = client.get(f"{API}/reports/cash").json()
+    assert cash["cost_of_goods"] == 0
+    assert cash["gross_profit"] == 0
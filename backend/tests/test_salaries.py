@@ -0,0 +1,119 @@
+from app.models.salary_payment import SalaryPayment, PaymentType
+from app.models.work_log import WorkLog
+from app.models.worker_balance import WorkerBalance
+from app.services import balances
+
+API = "/api/v1"
+
+
+def _work_log(client, product, admin, worker, as_user, quantity: int = 3) -> int:
+    """Запись о работе на quantity * 10 (текущим пользователем остается администратор)"""
+    created = product(produce=quantity)
+    as_user(worker)
+    work_log = client.post(f"{API}/work-logs/", json={
+        "product_id": created["id"], "stage_id": created["stages"][0]["id"], "quantity": quantity
+    }).json()
+    as_user(admin)
+    return work_log["id"]
+
+
+def _advance(client, worker, amount: float):
+    client.post(f"{API}/salaries/", json={"worker_id": worker.id, "amount": amount, "payment_type": "advance"})
+
+
+def _salary_payments(db, worker) -> list:
+    return [
+        payment.amount for payment in db.query(SalaryPayment).filter(
+            SalaryPayment.worker_id == worker.id,
+            SalaryPayment.payment_type == PaymentType.SALARY
+        )
+    ]
+
+
+def test_mark_paid_deducts_advances(client, db, product, admin, worker, as_user):
+    work_log_id = _work_log(client, product, admin, worker, as_user)
+    _advance(client, worker, 10)
+
+    response = client.post(f"{API}/work-logs/mark-paid", json={"work_log_ids": [work_log_id]})
+
+    assert response.status_code == 200
+    assert db.get(WorkLog, work_log_id).is_paid
+    assert _salary_payments(db, worker) == [20.0]
+    assert balances.verify(db) == []
+
+
+def test_mark_paid_settles_logs_covered_by_advances(client, db, product, admin, worker, as_user):
+    work_log_id = _work_log(client, product, admin, worker, as_user)
+    _advance(client, worker, 50)
+
+    response = client.post(f"{API}/work-logs/mark-paid", json={"work_log_ids": [work_log_id]})
+
+    assert response.status_code == 200
+    assert db.get(WorkLog, work_log_id).is_paid
+    assert _salary_payments(db, worker) == []
+    assert balances.verify(db) == []
+
+
+def test_mark_paid_settles_zero_payment_logs(client, db, product, admin, worker, as_user):
+    created = product([{"name": "Упаковка", "order_num": 1, "payment": 0}], produce=1)
+    as_user(worker)
+    work_log_id = client.post(f"{API}/work-logs/", json={
+        "product_id": created["id"], "stage_id": created["stages"][0]["id"], "quantity": 1
+    }).json()["id"]
+    as_user(admin)
+
+    response = client.post(f"{API}/work-logs/mark-paid", json={"work_log_ids": [work_log_id]})
+
+    assert response.status_code == 200
+    assert db.get(WorkLog, work_log_id).is_paid
+    assert db.get(WorkerBalance, worker.id).unpaid_count == 0
+
+
+def test_mark_paid_refuses_without_balance_row(client, db, product, admin, worker, as_user):
+    work_log_id = _work_log(client, product, admin, worker, as_user)
+    db.query(WorkerBalance).delete()
+    db.commit()
+
+    response = client.post(f"{API}/work-logs/mark-paid", json={"work_log_ids": [work_log_id]})
+
+    assert response.status_code == 409
+    assert not db.get(WorkLog, work_log_id).is_paid
+    assert _salary_payments(db, worker) == []
+
+
+def test_payroll_run_pays_period(client, db, product, admin, worker, as_user):
+    work_log_id = _work_log(client, product, admin, worker, as_user)
+    _advance(client, worker, 10)
+
+    response = client.post(f"{API}/salaries/runs", params={"period_end": "2100-01-01"})
+
+    assert response.status_code == 201
+    run = response.json()
+    assert run["logs_count"] == 1
+    assert run["total_paid"] == 20.0
+    assert run["lines"][0]["balance_before"] == 20.0
+    assert db.get(WorkLog, work_log_id).is_paid
+    payment = db.get(SalaryPayment, run["lines"][0]["salary_payment_id"])
+    assert payment.comment == f"Расчет №{run['id']} по 01.01.2100: 1 этапов (с учетом авансов)"
+    assert client.post(f"{API}/salaries/runs", params={"period_end": "2100-01-01"}).status_code == 400
+
+
+def test_payroll_run_ignores_work_after_period(client, db, product, admin, worker, as_user):
+    created = product(produce=15)
+    entry = {"product_id": created["id"], "stage_id": created["stages"][0]["id"]}
+    as_user(worker)
+    client.post(f"{API}/work-logs/sync", json=[
+        {**entry, "quantity": 10, "idempotency_key": "period", "client_timestamp": "2026-01-10T12:00:00"},
+        {**entry, "quantity": 5, "idempotency_key": "later", "client_timestamp": "2026-02-03T12:00:00"}
+    ])
+    as_user(admin)
+    _advance(client, worker, 30)
+
+    response = client.post(f"{API}/salaries/runs", params={"period_end": "2026-01-31"})
+
+    assert response.status_code == 201
+    line, = response.json()["lines"]
+    assert line["logs_amount"] == 100.0
+    assert line["balance_before"] == 70.0
+    assert line["amount"] == 70.0
+    assert db.get(WorkerBalance, worker.id).unpaid_amount == 50.0
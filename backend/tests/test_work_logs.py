@@ -0,0 +1,23 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models.work_log import WorkLog
+
+API = "/api/v1"
+
+
+def test_sync_books_work_at_client_time(client, db, product, worker, as_user):
+    created = product(produce=2)
+    entry = {"product_id": created["id"], "stage_id": created["stages"][0]["id"], "quantity": 1}
+    done_at = datetime(2026, 3, 1, 12, 0, tzinfo=timezone(timedelta(hours=3)))
+    future = datetime.utcnow() + timedelta(days=1)
+
+    as_user(worker)
+    response = client.post(f"{API}/work-logs/sync", json=[
+        {**entry, "idempotency_key": "past", "client_timestamp": done_at.isoformat()},
+        {**entry, "idempotency_key": "future", "client_timestamp": future.isoformat()}
+    ])
+
+    assert response.status_code == 200
+    ids = {ack["key"]: ack["work_log_id"] for ack in response.json()}
+    assert db.get(WorkLog, ids["past"]).completed_at == datetime(2026, 3, 1, 9, 0)
+    assert db.get(WorkLog, ids["future"]).completed_at <= datetime.utcnow()
@@ -0,0 +1,27 @@
+import sys
+from app.core.database import SessionLocal, engine, Base
+from app.models.worker_balance import WorkerBalance
+from app.services import balances
+
+# Сверяет worker_balances с work_logs / salary_payments.
+# С флагом --fix пересобирает таблицу балансов.
+
+def verify_balances(fix: bool = False):
+    Base.metadata.create_all(bind=engine, tables=[WorkerBalance.__table__])
+
+    db = SessionLocal()
+    try:
+        mismatches = balances.verify(db)
+        for m in mismatches:
+            print(f"worker {m['worker_id']}: {m['field']} stored={m['stored']} expected={m['expected']}")
+        if not mismatches:
+            print("Worker balances are consistent.")
+        elif fix:
+            balances.rebuild(db)
+            db.commit()
+            print("Worker balances rebuilt.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    verify_balances(fix="--fix" in sys.argv)
@@ -38,5 +38,6 @@ export * from './expenses'
 export * from './users'
 export * from './tasks'
 export * from './salaries'
+export * from './search'
 
 export default api
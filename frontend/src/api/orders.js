@@ -26,6 +26,11 @@ export const ordersAPI = {
         return api.patch(`/orders/${id}/status`, { status })
     },
 
+    // Update statuses of several orders at once: [{ order_id, status }]
+    updateStatusBatch(updates) {
+        return api.post('/orders/status/batch', updates)
+    },
+
     // Get my orders (for wholesaler)
     getMyOrders() {
         return api.get('/orders/my')
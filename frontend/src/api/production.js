@@ -60,5 +60,9 @@ export const productionAPI = {
 
     launchProduction(productId, quantity) {
         return api.post(`/products/${productId}/produce`, null, { params: { quantity } })
+    },
+
+    launchProductionBatch(items) {
+        return api.post('/products/produce/batch', items)
     }
 }
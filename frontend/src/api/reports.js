@@ -13,7 +13,16 @@ export const reportsAPI = {
     withdrawCash(data) {
         return api.post('/reports/cash/withdraw', data)
     },
-    getDashboardStats() {
-        return api.get('/reports/dashboard-stats')
+    getDashboardStats(params) {
+        return api.get('/reports/dashboard-stats', { params })
+    },
+    createJob(data) {
+        return api.post('/reports/jobs', data)
+    },
+    getJob(jobId) {
+        return api.get(`/reports/jobs/${jobId}`)
+    },
+    getJobResult(jobId) {
+        return api.get(`/reports/jobs/${jobId}/result`)
     }
 }
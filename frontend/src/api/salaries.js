@@ -9,5 +9,14 @@ export const salariesAPI = {
     },
     getMyHistory() {
         return api.get('/salaries/my-history')
+    },
+    createRun(periodEnd) {
+        return api.post('/salaries/runs', null, { params: { period_end: periodEnd } })
+    },
+    getRuns(params) {
+        return api.get('/salaries/runs', { params })
+    },
+    getRun(runId) {
+        return api.get(`/salaries/runs/${runId}`)
     }
 }
@@ -0,0 +1,8 @@
+import api from './index'
+
+export const searchAPI = {
+    // Search orders, products and users by word prefixes
+    search(q, params = {}) {
+        return api.get('/search/', { params: { q, ...params } })
+    }
+}
@@ -7,6 +7,13 @@ export const workLogsAPI = {
     create(data) {
         return api.post('/work-logs/', data)
     },
+    createBatch(entries) {
+        return api.post('/work-logs/batch', entries)
+    },
+    // Offline queue: [{ idempotency_key, client_timestamp, product_id, stage_id, quantity, order_id }]
+    sync(entries) {
+        return api.post('/work-logs/sync', entries)
+    },
     getMySalary() {
         return api.get('/work-logs/my-salary')
     },